@@ -1,8 +1,33 @@
 import random
 import os
-import msvcrt
+import re
+import sys
+import json
+import hashlib
+import heapq
+import shutil
+import argparse
+import multiprocessing
+import unicodedata
+try:
+    import msvcrt
+except ImportError:  # Non-Windows hosts can still run headless games
+    msvcrt = None
+try:
+    import termios
+    import tty
+except ImportError:
+    termios = tty = None
+try:
+    import numpy as np
+except ImportError:  # Only the agent environments need NumPy
+    np = None
 from enum import Enum
-from collections import deque
+from functools import lru_cache
+from array import array
+from collections import deque, Counter, OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 
 # ANSI color codes for better visual accessibility
 class Colors:
@@ -36,6 +61,22 @@ class Direction(Enum):
     LEFT = (-1, 0)
     RIGHT = (1, 0)
 
+DIRECTIONS = list(Direction)
+DOOR_BITS = {direction: 1 << i for i, direction in enumerate(DIRECTIONS)}
+ALL_DOORS = 0b1111
+
+class Action(Enum):
+    UP = "W"
+    LEFT = "A"
+    DOWN = "S"
+    RIGHT = "D"
+    RANGED = "R"
+    STAIRS = "F"
+    QUIT = "Q"
+
+MOVE_ACTIONS = {Action.UP: Direction.UP, Action.LEFT: Direction.LEFT,
+                Action.DOWN: Direction.DOWN, Action.RIGHT: Direction.RIGHT}
+
 class MonsterType(Enum):
     GOBLIN = "Goblin"
     SKELETON = "Skeleton"
@@ -73,15 +114,276 @@ class DamageResult(Enum):
     HIT = 2
     CRIT = 3
 
+class GameEvent:
+    """Something that happened in the game; subclasses name their fields in __slots__"""
+    __slots__ = ()
+
+    def __init__(self, *args):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+
+    def text(self):
+        """Message shown to the player, or None for events that are not displayed"""
+        return None
+
+    def to_dict(self):
+        data = {'event': type(self).__name__}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            data[name] = value.name if isinstance(value, Enum) else value
+        return data
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class Notice(GameEvent):
+    __slots__ = ('message',)
+
+    def text(self):
+        return self.message
+
+class AttackResolved(GameEvent):
+    __slots__ = ('monster_type', 'by_player', 'roll', 'attack', 'armor', 'result', 'damage')
+
+    def text(self):
+        name = self.monster_type.value
+        total = self.roll + self.attack
+        if self.by_player:
+            lines = [f"\nYou attack the {name}!"]
+            if self.result == DamageResult.CRIT:
+                lines.append(f"{Colors.BRIGHT_RED}CRITICAL HIT!{Colors.RESET} (Rolled {self.roll} + {self.attack} = {total})")
+            elif self.result == DamageResult.HIT:
+                lines.append(f"Hit! (Rolled {self.roll} + {self.attack} = {total} vs Armor {self.armor})")
+            elif self.result == DamageResult.HALF:
+                lines.append(f"Glancing blow! (Rolled {self.roll} + {self.attack} = {total} vs Armor {self.armor})")
+            else:
+                lines.append(f"Miss! (Rolled {self.roll} + {self.attack} = {total} vs Armor {self.armor})")
+            if self.damage > 0:
+                lines.append(f"You deal {self.damage} damage to the {name}!")
+        else:
+            lines = [f"\nThe {name} attacks you!"]
+            if self.result == DamageResult.CRIT:
+                lines.append(f"{Colors.BRIGHT_RED}CRITICAL HIT!{Colors.RESET} (Monster rolled {self.roll} + {self.attack} = {total})")
+            elif self.result == DamageResult.HIT:
+                lines.append(f"Hit! (Monster rolled {self.roll} + {self.attack} = {total} vs your Armor {self.armor})")
+            elif self.result == DamageResult.HALF:
+                lines.append(f"Glancing blow! (Monster rolled {self.roll} + {self.attack} = {total} vs your Armor {self.armor})")
+            else:
+                lines.append(f"Miss! (Monster rolled {self.roll} + {self.attack} = {total} vs your Armor {self.armor})")
+        return "\n".join(lines)
+
+class MonsterKilled(GameEvent):
+    __slots__ = ('monster_type', 'floor_level')
+
+    def text(self):
+        return f"You defeated the {self.monster_type.value}!"
+
+class DamageTaken(GameEvent):
+    __slots__ = ('amount', 'hp', 'max_hp')
+
+    def text(self):
+        return f"You take {self.amount} damage. HP: {self.hp}/{self.max_hp}"
+
+class PlayerDied(GameEvent):
+    __slots__ = ()
+
+    def text(self):
+        return "You have died."
+
+class Healed(GameEvent):
+    __slots__ = ('amount', 'hp', 'max_hp')
+
+    def text(self):
+        return f"You heal {self.amount} HP. HP: {self.hp}/{self.max_hp}"
+
+class ExpGained(GameEvent):
+    __slots__ = ('amount',)
+
+    def text(self):
+        return f"You gain {self.amount} experience!"
+
+class LevelUp(GameEvent):
+    __slots__ = ('level', 'max_hp', 'exp_needed')
+
+    def text(self):
+        return f"🎉 Level up! You are now level {self.level}\nMax HP: {self.max_hp}, Next level in {self.exp_needed} exp"
+
+class LootFound(GameEvent):
+    __slots__ = ('loot',)
+
+    def text(self):
+        return f"\nYou found: {self.loot}"
+
+class GemSocketed(GameEvent):
+    # gear_type is None when no socket was free
+    __slots__ = ('gem', 'gear_type')
+
+    def text(self):
+        if self.gear_type is None:
+            return "No available sockets for this gem."
+        return f"Socketed {self.gem} into {self.gear_type.value}"
+
+class EquipOffered(GameEvent):
+    # stat is None for gear that doesn't map to attack or armor
+    __slots__ = ('gear', 'slot', 'stat', 'bonus_change')
+
+    def text(self):
+        if self.stat is None:
+            question = "Equip it?"
+        elif self.bonus_change > 0:
+            question = f"Equip it? +{self.bonus_change} {self.stat}"
+        elif self.bonus_change < 0:
+            question = f"Equip it? -{abs(self.bonus_change)} {self.stat}"
+        else:
+            question = "Equip it? No change"
+        return f"{question}\n1. Equip it\n2. Leave it"
+
+class GearEquipped(GameEvent):
+    # slot is None when the gear had nowhere to go
+    __slots__ = ('gear', 'slot')
+
+    def text(self):
+        if self.slot is None:
+            return "Cannot equip this item - no suitable slot"
+        return f"Equipped {self.gear} in {self.slot}"
+
+class PlayerMoved(GameEvent):
+    __slots__ = ('direction', 'x', 'y', 'shape')
+
+    def text(self):
+        shape_name = self.shape.value if self.shape else "Room"
+        return f"You move {self.direction.name} to ({self.x}, {self.y}) - {shape_name}"
+
+class MonsterEncountered(GameEvent):
+    __slots__ = ('monster_type', 'x', 'y')
+
+    def text(self):
+        return f"You encounter a {self.monster_type.value}!"
+
+class MonsterMoved(GameEvent):
+    __slots__ = ('monster_type', 'from_x', 'from_y', 'to_x', 'to_y')
+
+class LairLooted(GameEvent):
+    __slots__ = ('x', 'y')
+
+    def text(self):
+        return "The lair has been looted and becomes stairs!"
+
+class TileGenerated(GameEvent):
+    __slots__ = ('floor', 'x', 'y', 'tile_type', 'shape')
+
+class FloorDescended(GameEvent):
+    __slots__ = ('floor',)
+
+    def text(self):
+        return "\nYou descend to the next floor..."
+
+class TargetsListed(GameEvent):
+    # targets holds (monster, direction, distance) with distance None for melee
+    __slots__ = ('targets', 'ranged')
+
+    def text(self):
+        if self.ranged:
+            lines = ["\nRanged attack targets:"]
+            for i, (monster, direction, distance) in enumerate(self.targets, 1):
+                lines.append(f"{i}. {monster.type.value} {distance} tiles to the {direction.name}")
+        else:
+            lines = ["\nAdjacent monsters:"]
+            for i, (monster, direction, distance) in enumerate(self.targets, 1):
+                lines.append(f"{i}. {monster.type.value} to the {direction.name}")
+        return "\n".join(lines)
+
+class PlayerDefeated(GameEvent):
+    __slots__ = ()
+
+    def text(self):
+        return "You have been defeated..."
+
+class GameOver(GameEvent):
+    __slots__ = ('floor', 'max_floor_mapped')
+
+    def text(self):
+        return f"\nGame Over! You reached floor {self.floor}\nMax floor mapped: {self.max_floor_mapped}"
+
+class EventBus:
+    """Delivers game events to subscribers, building them only when someone is listening"""
+    def __init__(self):
+        self.handlers = []
+
+    def subscribe(self, handler):
+        self.handlers.append(handler)
+        return handler
+
+    def unsubscribe(self, handler):
+        self.handlers.remove(handler)
+
+    def emit(self, event_type, *args):
+        if not self.handlers:
+            return
+        event = event_type(*args)
+        for handler in self.handlers:
+            handler(event)
+
+class TextSink:
+    """Event handler that formats displayable events and passes the text to write"""
+    def __init__(self, write=print):
+        self.write = write
+
+    def __call__(self, event):
+        text = event.text()
+        if text is not None:
+            self.write(text)
+
+class StepResult:
+    """Structured outcome of a single Game.step() call"""
+    def __init__(self, game, action):
+        self.action = action
+        self.turn = game.turn
+        self.floor = game.current_floor
+        self.x = game.player.x
+        self.y = game.player.y
+        self.hp = game.player.current_hp
+        self.max_hp = game.player.max_hp
+        self.level = game.player.level
+        self.exp = game.player.exp
+        self.game_over = game.game_over
+        self.victory = game.victory
+
+    @property
+    def done(self):
+        return self.game_over or self.victory
+
+GEM_BONUS = {GemColor.GREEN: 1, GemColor.BLUE: 2, GemColor.PURPLE: 3}
+
 class Gem:
-    def __init__(self, color: GemColor, floor_level=1):
-        self.color = color
-        # simple bonus mapping
-        self.bonus = {GemColor.GREEN: 1, GemColor.BLUE: 2, GemColor.PURPLE: 3}.get(color, 1)
+    """Gems never change once made, so each color is interned and shared"""
+    __slots__ = ('color', 'bonus')
+    _interned = {}
+
+    def __new__(cls, color: GemColor, floor_level=1):
+        gem = cls._interned.get(color)
+        if gem is None:
+            gem = super().__new__(cls)
+            gem.color = color
+            # simple bonus mapping
+            gem.bonus = GEM_BONUS.get(color, 1)
+            cls._interned[color] = gem
+        return gem
+
+    def __reduce__(self):
+        # Unpickle through the intern table too
+        return (Gem, (self.color,))
+
+    def copy(self):
+        return self
+
     def __str__(self):
         return f"{self.color.value} Gem +{self.bonus}"
 
 class Gear:
+    __slots__ = ('type', 'bonus', 'sockets', 'max_sockets', 'is_adamantine', 'is_dragonscale')
+
     def __init__(self, gear_type: GearType, floor_level=1):
         self.type = gear_type
         # Set bonus based on gear type according to game rules
@@ -101,7 +403,7 @@ class Gear:
             self.bonus = floor_level + 1  # rng - could be randomized
         else:
             self.bonus = floor_level
-        self.sockets = []
+        self.sockets = ()  # Shared empty tuple until the first gem goes in
         # Set max sockets based on bonus level (applies to all gear)
         if self.bonus >= 6:
             self.max_sockets = 3
@@ -122,9 +424,19 @@ class Gear:
             total += 6
         return total
 
+    def copy(self):
+        gear = Gear.__new__(Gear)
+        gear.type = self.type
+        gear.bonus = self.bonus
+        gear.sockets = self.sockets
+        gear.max_sockets = self.max_sockets
+        gear.is_adamantine = self.is_adamantine
+        gear.is_dragonscale = self.is_dragonscale
+        return gear
+
     def add_gem(self, gem: Gem):
         if len(self.sockets) < self.max_sockets:
-            self.sockets.append(gem)
+            self.sockets += (gem,)
             return True
         return False
 
@@ -143,39 +455,92 @@ class Gear:
                 socket_visual += "○"  # Empty circle
         return f"{self.type.value} +{self.get_total_bonus()} {socket_visual}"
 
+class GearSpawn:
+    """Gear waiting on a tile, kept as its recipe until someone picks it up.
+
+    Like gems these are interned, here by (type, floor, adamantine), so gear
+    on tiles the player never reaches costs no allocation of its own. It
+    answers type, bonus and is_adamantine like the Gear that build() makes.
+    """
+    __slots__ = ('type', 'floor_level', 'is_adamantine', 'bonus')
+    _interned = {}
+
+    def __new__(cls, gear_type: GearType, floor_level=1, adamantine=False):
+        key = (gear_type, floor_level, adamantine)
+        spawn = cls._interned.get(key)
+        if spawn is None:
+            spawn = super().__new__(cls)
+            spawn.type, spawn.floor_level, spawn.is_adamantine = key
+            spawn.bonus = Gear(gear_type, floor_level).bonus
+            cls._interned[key] = spawn
+        return spawn
+
+    def __reduce__(self):
+        return (GearSpawn, (self.type, self.floor_level, self.is_adamantine))
+
+    def build(self):
+        gear = Gear(self.type, self.floor_level)
+        gear.is_adamantine = self.is_adamantine
+        return gear
+
+    def copy(self):
+        return self
+
+    def __str__(self):
+        return str(self.build())
+
+class MonsterStats:
+    """Base stats shared by every monster of one type on one floor; treat as read-only"""
+    __slots__ = ('hp', 'attack', 'armor', 'exp')
+    _cache = {}
+
+    def __init__(self, hp, attack, armor, exp):
+        self.hp = hp
+        self.attack = attack
+        self.armor = armor
+        self.exp = exp
+
+    @classmethod
+    def lookup(cls, monster_type, floor_level):
+        key = (monster_type, floor_level)
+        stats = cls._cache.get(key)
+        if stats is None:
+            # Set stats based on monster type according to rules
+            if monster_type == MonsterType.GOBLIN:
+                stats = cls(5 + floor_level, floor_level, floor_level, 2)
+            elif monster_type == MonsterType.SKELETON:
+                stats = cls(7 + floor_level, floor_level + 1, floor_level + 1, 3)
+            elif monster_type == MonsterType.MINOTAUR:
+                stats = cls(12 + floor_level, floor_level + 4, floor_level + 4, 6)
+            elif monster_type == MonsterType.DRAGON:
+                stats = cls(20 + floor_level, floor_level + 6, floor_level + 6, 12)
+            else:
+                # Default for any other monsters
+                stats = cls(3 + floor_level, floor_level, floor_level, 1 + floor_level // 2)
+            cls._cache[key] = stats
+        return stats
+
 class Monster:
+    __slots__ = ('type', 'floor_level', 'stats', 'hp', 'alive')
+
     def __init__(self, monster_type: MonsterType, floor_level=1):
         self.type = monster_type
         self.floor_level = floor_level
         self.alive = True
+        self.stats = MonsterStats.lookup(monster_type, floor_level)
+        self.hp = self.stats.hp
 
-        # Set stats based on monster type according to rules
-        if monster_type == MonsterType.GOBLIN:
-            self.hp = 5 + floor_level
-            self.attack = floor_level
-            self.armor = floor_level
-            self.exp = 2
-        elif monster_type == MonsterType.SKELETON:
-            self.hp = 7 + floor_level
-            self.attack = floor_level + 1
-            self.armor = floor_level + 1
-            self.exp = 3
-        elif monster_type == MonsterType.MINOTAUR:
-            self.hp = 12 + floor_level
-            self.attack = floor_level + 4
-            self.armor = floor_level + 4
-            self.exp = 6
-        elif monster_type == MonsterType.DRAGON:
-            self.hp = 20 + floor_level
-            self.attack = floor_level + 6
-            self.armor = floor_level + 6
-            self.exp = 12
-        else:
-            # Default for any other monsters
-            self.hp = 3 + floor_level
-            self.attack = floor_level
-            self.armor = floor_level
-            self.exp = 1 + floor_level // 2
+    @property
+    def attack(self):
+        return self.stats.attack
+
+    @property
+    def armor(self):
+        return self.stats.armor
+
+    @property
+    def exp(self):
+        return self.stats.exp
 
     def take_damage(self, amount):
         self.hp -= amount
@@ -184,11 +549,49 @@ class Monster:
             return True
         return False
 
+    def copy(self):
+        monster = Monster.__new__(Monster)
+        monster.type = self.type
+        monster.floor_level = self.floor_level
+        monster.stats = self.stats
+        monster.hp = self.hp
+        monster.alive = self.alive
+        return monster
+
+class MonsterSpawn:
+    """A monster on a tile that is not on the floor yet, kept as its recipe.
+
+    Prebuilt hashed tiles can sit unplayed in large numbers, so like
+    GearSpawn these are interned, here by (type, floor), and the real
+    Monster is only made by build() when the tile is placed.
+    """
+    __slots__ = ('type', 'floor_level')
+    _interned = {}
+
+    def __new__(cls, monster_type: MonsterType, floor_level=1):
+        key = (monster_type, floor_level)
+        spawn = cls._interned.get(key)
+        if spawn is None:
+            spawn = super().__new__(cls)
+            spawn.type, spawn.floor_level = key
+            cls._interned[key] = spawn
+        return spawn
+
+    def __reduce__(self):
+        return (MonsterSpawn, (self.type, self.floor_level))
+
+    def build(self):
+        return Monster(self.type, self.floor_level)
+
+    def copy(self):
+        return self
+
     def __str__(self):
         return f"{self.type.value} (HP: {self.hp}, ATK: {self.attack}, ARM: {self.armor})"
 
 class Player:
-    def __init__(self):
+    def __init__(self, events=None):
+        self.events = events if events is not None else EventBus()
         self.level = 1
         self.max_hp = 6
         self.current_hp = 6
@@ -210,11 +613,55 @@ class Player:
         self.inventory = []
         self.x = 0
         self.y = 0
-        
-        # Calculate initial stats
-        self.armor = self.calculate_armor()
-        self.attack = self.calculate_attack()
-        
+
+        # Temporary bonuses by name: (melee attack, ranged attack, armor)
+        self.modifiers = {}
+        # (melee attack, ranged attack, armor) with modifiers, until stats_changed() drops it
+        self._stats = None
+
+    @property
+    def attack(self):
+        return self.derived_stats()[0]
+
+    @property
+    def ranged_attack(self):
+        return self.derived_stats()[1]
+
+    @property
+    def armor(self):
+        return self.derived_stats()[2]
+
+    def derived_stats(self):
+        """(melee attack, ranged attack, armor) from level, gear and modifiers.
+
+        Worked out once and kept until stats_changed(), which levelling up,
+        equipping gear, socketing a gem and changing modifiers all call.
+        """
+        stats = self._stats
+        if stats is None:
+            attack = self.calculate_attack()
+            ranged_attack = self.calculate_attack(ranged=True)
+            armor = self.calculate_armor()
+            for attack_bonus, ranged_bonus, armor_bonus in self.modifiers.values():
+                attack += attack_bonus
+                ranged_attack += ranged_bonus
+                armor += armor_bonus
+            stats = self._stats = (attack, ranged_attack, armor)
+        return stats
+
+    def stats_changed(self):
+        """Drop the derived stats; call after changing the player's level or gear"""
+        self._stats = None
+
+    def add_modifier(self, name, attack=0, ranged_attack=0, armor=0):
+        """Add (or replace) a temporary bonus, e.g. from a potion, until remove_modifier(name)"""
+        self.modifiers[name] = (attack, ranged_attack, armor)
+        self._stats = None
+
+    def remove_modifier(self, name):
+        if self.modifiers.pop(name, None) is not None:
+            self._stats = None
+
     def calculate_armor(self):
         """Calculate total armor from level and gear"""
         total = self.level  # Base armor from level
@@ -263,10 +710,10 @@ class Player:
     def take_damage(self, amount):
         """Apply damage to the player. Returns True if the player died."""
         self.current_hp -= amount
-        print(f"You take {amount} damage. HP: {self.current_hp}/{self.max_hp}")
+        self.events.emit(DamageTaken, amount, self.current_hp, self.max_hp)
         if self.current_hp <= 0:
             self.current_hp = 0
-            print("You have died.")
+            self.events.emit(PlayerDied)
             return True
         return False
     
@@ -276,12 +723,12 @@ class Player:
         self.current_hp = min(self.max_hp, self.current_hp + amount)
         healed = self.current_hp - old_hp
         if healed > 0:
-            print(f"You heal {healed} HP. HP: {self.current_hp}/{self.max_hp}")
+            self.events.emit(Healed, healed, self.current_hp, self.max_hp)
     
     def gain_exp(self, amount):
         """Gain experience and check for level up"""
         self.exp += amount
-        print(f"You gain {amount} experience!")
+        self.events.emit(ExpGained, amount)
         while self.exp >= self.exp_needed:
             self.level_up()
     
@@ -293,9 +740,21 @@ class Player:
         excess_exp = self.exp - self.exp_needed
         self.exp_needed += 1
         self.exp = excess_exp
-        print(f"🎉 Level up! You are now level {self.level}")
-        print(f"Max HP: {self.max_hp}, Next level in {self.exp_needed} exp")
+        self.stats_changed()
+        self.events.emit(LevelUp, self.level, self.max_hp, self.exp_needed)
     
+    def copy(self, events=None):
+        """An independent copy of this player, reporting to `events`"""
+        player = Player.__new__(Player)
+        player.__dict__.update(self.__dict__)
+        player.events = events if events is not None else EventBus()
+        player.gear = {slot: item.copy() if isinstance(item, Gear) else item
+                       for slot, item in self.gear.items()}
+        player.modifiers = self.modifiers.copy()
+        player.inventory = [item.copy() if isinstance(item, (Gear, Gem)) else item
+                            for item in self.inventory]
+        return player
+
     def move(self, dx, dy):
         # Simple movement for player: update coordinates
         self.x += dx
@@ -303,7 +762,47 @@ class Player:
         # end Player.move
 
 
+# How a coordinate with no tile yet is drawn
+UNEXPLORED_STRIP = ("     ", " ?   ", "     ")
+
+class DoorMap:
+    """Dict-like view of a tile's door bitmask, indexed by Direction"""
+    __slots__ = ('_tile',)
+
+    def __init__(self, tile):
+        self._tile = tile
+
+    def __getitem__(self, direction):
+        return bool(self._tile.door_mask & DOOR_BITS[direction])
+
+    def __setitem__(self, direction, is_open):
+        if is_open:
+            self._tile.door_mask |= DOOR_BITS[direction]
+        else:
+            self._tile.door_mask &= ~DOOR_BITS[direction]
+
+    def get(self, direction, default=False):
+        return self[direction] if direction in DOOR_BITS else default
+
+    def __iter__(self):
+        return iter(DIRECTIONS)
+
+    def __len__(self):
+        return len(DIRECTIONS)
+
+    def keys(self):
+        return list(DIRECTIONS)
+
+    def values(self):
+        return [self[direction] for direction in DIRECTIONS]
+
+    def items(self):
+        return [(direction, self[direction]) for direction in DIRECTIONS]
+
 class Tile:
+    __slots__ = ('x', 'y', 'type', 'shape', 'monster', 'loot', 'revealed', 'door_mask', 'entrance_direction',
+                 '_strip')
+
     def __init__(self, x, y, tile_type=TileType.EMPTY, shape=None):
         self.x = x
         self.y = y
@@ -312,20 +811,35 @@ class Tile:
         self.monster = None
         self.loot = None
         self.revealed = False
-        self.doors = {Direction.UP: False, Direction.DOWN: False,
-                     Direction.LEFT: False, Direction.RIGHT: False}
+        self.door_mask = 0  # One DOOR_BITS bit per open door
         self.entrance_direction = None
+        self._strip = None  # (render key, rendered rows) from the last get_strip()
+
+    @property
+    def doors(self):
+        return DoorMap(self)
+
+    def copy(self):
+        """An independent copy of this tile, with its own monster and loot"""
+        tile = Tile.__new__(Tile)
+        tile.x = self.x
+        tile.y = self.y
+        tile.type = self.type
+        tile.shape = self.shape
+        tile.monster = self.monster.copy() if self.monster else None
+        tile.loot = self.loot.copy() if self.loot else None
+        tile.revealed = self.revealed
+        tile.door_mask = self.door_mask
+        tile.entrance_direction = self.entrance_direction
+        tile._strip = self._strip
+        return tile
 
     def configure_doors_from_shape(self, entrance_direction):
         """Configure doors based on tile shape and entrance direction"""
         self.entrance_direction = entrance_direction
         
-        # Clear all doors first
-        for direction in Direction:
-            self.doors[direction] = False
-            
-        # Always have door back to where we came from
-        self.doors[entrance_direction] = True
+        # Clear all doors first, then always have door back to where we came from
+        mask = DOOR_BITS[entrance_direction]
         
         # Add additional doors based on shape
         if self.shape == TileShape.DEAD_END:
@@ -333,25 +847,24 @@ class Tile:
             
         elif self.shape == TileShape.LEFT:
             left_dir = self.get_left_turn(entrance_direction)
-            self.doors[left_dir] = True
+            mask |= DOOR_BITS[left_dir]
             
         elif self.shape == TileShape.RIGHT:
             right_dir = self.get_right_turn(entrance_direction)
-            self.doors[right_dir] = True
+            mask |= DOOR_BITS[right_dir]
             
         elif self.shape == TileShape.STRAIGHT:
             straight_dir = self.get_opposite_direction(entrance_direction)
-            self.doors[straight_dir] = True
+            mask |= DOOR_BITS[straight_dir]
             
         elif self.shape == TileShape.T_INTERSECTION:
             left_dir = self.get_left_turn(entrance_direction)
             right_dir = self.get_right_turn(entrance_direction)
-            self.doors[left_dir] = True
-            self.doors[right_dir] = True
+            mask |= DOOR_BITS[left_dir] | DOOR_BITS[right_dir]
             
         elif self.shape == TileShape.ALL_WAY:
-            for direction in Direction:
-                self.doors[direction] = True
+            mask = ALL_DOORS
+        self.door_mask = mask
         
         # CRITICAL FIX: Always ensure two-way connections
         # If tile A has a door to tile B, tile B should have a door back to tile A
@@ -374,13 +887,13 @@ class Tile:
         grid[1][1] = center_char
 
         # Show doors based on actual connections
-        if self.doors[Direction.UP]:
+        if self.has_door(Direction.UP):
             grid[0][1] = ' '  # Open passage up
-        if self.doors[Direction.DOWN]:
+        if self.has_door(Direction.DOWN):
             grid[2][1] = ' '  # Open passage down
-        if self.doors[Direction.LEFT]:
+        if self.has_door(Direction.LEFT):
             grid[1][0] = ' '  # Open passage left
-        if self.doors[Direction.RIGHT]:
+        if self.has_door(Direction.RIGHT):
             grid[1][2] = ' '  # Open passage right
 
         return grid
@@ -400,36 +913,60 @@ class Tile:
         grid[1][2] = center_char
 
         # Show doors based on actual connections
-        if self.doors[Direction.UP]:
+        if self.has_door(Direction.UP):
             grid[0][1] = ' '  # Open passage up (wider)
             grid[0][2] = ' '
             grid[0][3] = ' '
-        if self.doors[Direction.DOWN]:
+        if self.has_door(Direction.DOWN):
             grid[2][1] = ' '  # Open passage down (wider)
             grid[2][2] = ' '
             grid[2][3] = ' '
-        if self.doors[Direction.LEFT]:
+        if self.has_door(Direction.LEFT):
             grid[1][0] = ' '  # Open passage left
-        if self.doors[Direction.RIGHT]:
+        if self.has_door(Direction.RIGHT):
             grid[1][4] = ' '  # Open passage right
 
         # Special representation for starting tile: use lines for doors
         if self.x == 0 and self.y == 0:
-            if self.doors[Direction.UP]:
+            if self.has_door(Direction.UP):
                 grid[0][1] = '-'
                 grid[0][2] = '-'
                 grid[0][3] = '-'
-            if self.doors[Direction.DOWN]:
+            if self.has_door(Direction.DOWN):
                 grid[2][1] = '-'
                 grid[2][2] = '-'
                 grid[2][3] = '-'
-            if self.doors[Direction.LEFT]:
+            if self.has_door(Direction.LEFT):
                 grid[1][0] = '|'
-            if self.doors[Direction.RIGHT]:
+            if self.has_door(Direction.RIGHT):
                 grid[1][4] = '|'
 
         return grid
 
+    def render_key(self, show_player=False):
+        """Everything the 5x3 picture depends on; a cached strip is dirty once this changes"""
+        if show_player:
+            content = 'P'
+        elif not self.revealed:
+            content = '?'
+        elif self.monster and self.monster.alive:
+            content = self.monster.type
+        elif self.loot:
+            content = '!'
+        else:
+            content = self.type
+        return (self.door_mask, content)
+
+    def get_strip(self, show_player=False):
+        """The 5x3 representation as three joined rows, re-rendered only when the tile changed"""
+        key = self.render_key(show_player)
+        strip = self._strip
+        if strip is None or strip[0] != key:
+            rows = tuple(''.join(row) for row in self.get_5x3_representation(show_player))
+            strip = (key, rows)
+            self._strip = strip
+        return strip[1]
+
     def get_center_symbol(self):
         """Get symbol that represents the tile type and shape"""
         if not self.revealed:
@@ -486,10 +1023,10 @@ class Tile:
         return right_turns[direction]
 
     def add_door(self, direction):
-        self.doors[direction] = True
+        self.door_mask |= DOOR_BITS[direction]
         
     def has_door(self, direction):
-        return self.doors.get(direction, False)
+        return bool(self.door_mask & DOOR_BITS.get(direction, 0))
         
     def __str__(self):
         if not self.revealed:
@@ -518,27 +1055,683 @@ class Tile:
             return "┼"
         return "."
 
+TILE_TYPES = list(TileType)
+TILE_SHAPES = [None] + list(TileShape)
+ENTRANCES = [None] + DIRECTIONS
+
+class TileView(Tile):
+    """A Tile whose state lives in a CompactGrid cell instead of its own attributes"""
+    __slots__ = ('_grid', '_cell')
+
+    def __init__(self, grid, cell):
+        self._grid = grid
+        self._cell = cell
+
+    @property
+    def x(self):
+        return self._grid.min_x + self._cell % self._grid.width
+
+    @property
+    def y(self):
+        return self._grid.min_y + self._cell // self._grid.width
+
+    @property
+    def type(self):
+        return TILE_TYPES[self._grid.types[self._cell]]
+
+    @type.setter
+    def type(self, tile_type):
+        self._grid.types[self._cell] = TILE_TYPES.index(tile_type)
+
+    @property
+    def shape(self):
+        return TILE_SHAPES[self._grid.shapes[self._cell]]
+
+    @shape.setter
+    def shape(self, shape):
+        self._grid.shapes[self._cell] = TILE_SHAPES.index(shape)
+
+    @property
+    def entrance_direction(self):
+        return ENTRANCES[self._grid.entrances[self._cell]]
+
+    @entrance_direction.setter
+    def entrance_direction(self, direction):
+        self._grid.entrances[self._cell] = ENTRANCES.index(direction)
+
+    @property
+    def revealed(self):
+        return bool(self._grid.flags[self._cell] & CompactGrid.REVEALED)
+
+    @revealed.setter
+    def revealed(self, revealed):
+        if revealed:
+            self._grid.flags[self._cell] |= CompactGrid.REVEALED
+        else:
+            self._grid.flags[self._cell] &= ~CompactGrid.REVEALED
+
+    @property
+    def monster(self):
+        return self._grid.objects[self._grid.monster_ids[self._cell]]
+
+    @monster.setter
+    def monster(self, monster):
+        self._grid.set_object(self._grid.monster_ids, self._cell, monster)
+
+    @property
+    def loot(self):
+        return self._grid.objects[self._grid.loot_ids[self._cell]]
+
+    @loot.setter
+    def loot(self, loot):
+        self._grid.set_object(self._grid.loot_ids, self._cell, loot)
+
+    @property
+    def _strip(self):
+        return self._grid.strips.get(self._cell)
+
+    @_strip.setter
+    def _strip(self, strip):
+        self._grid.strips[self._cell] = strip
+
+    @property
+    def door_mask(self):
+        return self._grid.doors[self._cell]
+
+    @door_mask.setter
+    def door_mask(self, mask):
+        self._grid.doors[self._cell] = mask
+
+class CompactGrid:
+    """Floor store backed by flat per-cell arrays over a fixed rectangle.
+
+    Each cell keeps a 4-bit door mask plus small codes for its type, shape,
+    entrance and flags; monsters and loot sit in a shared object table and
+    cells hold their ids (0 = none). It supports the dict operations the game
+    uses on Dungeon.grid and hands out TileView objects, so rendering and the
+    AI work unchanged. Iteration follows insertion order, like a dict.
+    """
+    PRESENT = 1
+    REVEALED = 2
+
+    def __init__(self, min_x, min_y, width, height):
+        self.min_x = min_x
+        self.min_y = min_y
+        self.width = width
+        self.height = height
+        cells = width * height
+        self.flags = bytearray(cells)
+        self.doors = bytearray(cells)
+        self.types = bytearray(cells)
+        self.shapes = bytearray(cells)
+        self.entrances = bytearray(cells)
+        self.monster_ids = array('H', bytes(2 * cells))
+        self.loot_ids = array('H', bytes(2 * cells))
+        self.objects = [None]  # id 0 is "nothing"
+        self.free_ids = []
+        self.order = array('H')
+        self.strips = {}  # cell -> cached render strip, only filled in when the map is drawn
+
+    def cell_index(self, coord):
+        """Array index of a coordinate, or None if it falls outside this grid"""
+        x, y = coord
+        col = x - self.min_x
+        row = y - self.min_y
+        if 0 <= col < self.width and 0 <= row < self.height:
+            return row * self.width + col
+        return None
+
+    def set_object(self, ids, cell, obj):
+        old_id = ids[cell]
+        if old_id:
+            self.objects[old_id] = None
+            self.free_ids.append(old_id)
+        if obj is None:
+            ids[cell] = 0
+            return
+        if self.free_ids:
+            new_id = self.free_ids.pop()
+            self.objects[new_id] = obj
+        else:
+            new_id = len(self.objects)
+            self.objects.append(obj)
+        ids[cell] = new_id
+
+    def __setitem__(self, coord, tile):
+        cell = self.cell_index(coord)
+        if cell is None:
+            raise KeyError(coord)
+        if not self.flags[cell] & self.PRESENT:
+            self.order.append(cell)
+        self.flags[cell] = self.PRESENT | (self.REVEALED if tile.revealed else 0)
+        self.doors[cell] = tile.door_mask
+        self.types[cell] = TILE_TYPES.index(tile.type)
+        self.shapes[cell] = TILE_SHAPES.index(tile.shape)
+        self.entrances[cell] = ENTRANCES.index(tile.entrance_direction)
+        self.set_object(self.monster_ids, cell, tile.monster)
+        self.set_object(self.loot_ids, cell, tile.loot)
+
+    def __getitem__(self, coord):
+        cell = self.cell_index(coord)
+        if cell is None or not self.flags[cell] & self.PRESENT:
+            raise KeyError(coord)
+        return TileView(self, cell)
+
+    def get(self, coord, default=None):
+        cell = self.cell_index(coord)
+        if cell is None or not self.flags[cell] & self.PRESENT:
+            return default
+        return TileView(self, cell)
+
+    def __contains__(self, coord):
+        cell = self.cell_index(coord)
+        return cell is not None and bool(self.flags[cell] & self.PRESENT)
+
+    def __len__(self):
+        return len(self.order)
+
+    def coord(self, cell):
+        return (self.min_x + cell % self.width, self.min_y + cell // self.width)
+
+    def copy(self):
+        """An independent copy: the arrays are copied, monsters and loot cloned"""
+        grid = CompactGrid.__new__(CompactGrid)
+        grid.min_x = self.min_x
+        grid.min_y = self.min_y
+        grid.width = self.width
+        grid.height = self.height
+        grid.flags = self.flags[:]
+        grid.doors = self.doors[:]
+        grid.types = self.types[:]
+        grid.shapes = self.shapes[:]
+        grid.entrances = self.entrances[:]
+        grid.monster_ids = self.monster_ids[:]
+        grid.loot_ids = self.loot_ids[:]
+        grid.objects = [obj.copy() if obj is not None else None for obj in self.objects]
+        grid.free_ids = self.free_ids[:]
+        grid.order = self.order[:]
+        grid.strips = {}
+        return grid
+
+    def __iter__(self):
+        return (self.coord(cell) for cell in self.order)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [TileView(self, cell) for cell in self.order]
+
+    def items(self):
+        return [(self.coord(cell), TileView(self, cell)) for cell in self.order]
+
+# Floors this far from the start in every direction by default (a 9x9 box)
+FLOOR_RADIUS = 4
+# Side of the square CompactGrid chunks a ChunkedGrid is built from
+CHUNK_SIZE = 16
+# On large floors only monsters this many door steps from the player or closer take turns
+ACTIVATION_RADIUS = 12
+# Side of the square of tiles each minimap character stands for
+MINIMAP_BLOCK = 8
+# Minimap characters from an unexplored square to a fully revealed one
+MINIMAP_SHADES = ' ░▒▓█'
+
+class ChunkedGrid:
+    """Sparse floor store for large floors, made of CHUNK_SIZE x CHUNK_SIZE CompactGrids.
+
+    A chunk is allocated when the first tile lands in it, so memory follows
+    the explored area rather than the floor's bounding box. Same dict
+    operations as CompactGrid, also iterating in insertion order.
+    """
+    def __init__(self):
+        self.chunks = {}  # (x // CHUNK_SIZE, y // CHUNK_SIZE) -> CompactGrid
+        self.order = []
+
+    def chunk(self, coord, create=False):
+        key = (coord[0] // CHUNK_SIZE, coord[1] // CHUNK_SIZE)
+        chunk = self.chunks.get(key)
+        if chunk is None and create:
+            chunk = CompactGrid(key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+            self.chunks[key] = chunk
+        return chunk
+
+    def __setitem__(self, coord, tile):
+        chunk = self.chunk(coord, create=True)
+        if coord not in chunk:
+            self.order.append(coord)
+        chunk[coord] = tile
+
+    def __getitem__(self, coord):
+        chunk = self.chunk(coord)
+        if chunk is None:
+            raise KeyError(coord)
+        return chunk[coord]
+
+    def get(self, coord, default=None):
+        chunk = self.chunk(coord)
+        return default if chunk is None else chunk.get(coord, default)
+
+    def __contains__(self, coord):
+        chunk = self.chunk(coord)
+        return chunk is not None and coord in chunk
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def keys(self):
+        return list(self.order)
+
+    def values(self):
+        return [self[coord] for coord in self.order]
+
+    def items(self):
+        return [(coord, self[coord]) for coord in self.order]
+
+    def copy(self):
+        grid = ChunkedGrid.__new__(ChunkedGrid)
+        grid.chunks = {key: chunk.copy() for key, chunk in self.chunks.items()}
+        grid.order = self.order[:]
+        return grid
+
+NO_EXITS = array('h', [-1] * len(DIRECTIONS))
+
+class DoorGraph:
+    """All-pairs door distances for one floor, updated as tiles and doors appear.
+
+    Floors only ever gain tiles and doors, so each new one-way edge a -> b can
+    only shorten routes of the form i -> a -> b -> j; folding that in keeps the
+    table exact without re-running any search. Path queries then just walk
+    downhill through the table.
+    """
+    UNREACHABLE = 255  # Rows are bytearrays; a 9x9 floor never needs more than 80 steps
+
+    def __init__(self):
+        self.index = {}   # (x, y) -> node number
+        self.coords = []  # node number -> (x, y)
+        self.exits = array('h')  # 4 slots per node: neighbor node (or -1) per Direction, in Direction order
+        self.dist = []    # dist[a][b] = door steps from node a to node b, one bytearray per a
+
+    def add_node(self, coord):
+        node = len(self.coords)
+        self.index[coord] = node
+        self.coords.append(coord)
+        self.exits.extend(NO_EXITS)
+        for row in self.dist:
+            row.append(self.UNREACHABLE)
+        row = bytearray([self.UNREACHABLE]) * (node + 1)
+        row[node] = 0
+        self.dist.append(row)
+        return node
+
+    def add_edge(self, from_coord, direction, to_coord):
+        a = self.index[from_coord]
+        b = self.index[to_coord]
+        self.exits[4 * a + DIRECTIONS.index(direction)] = b
+        dist = self.dist
+        if dist[a][b] <= 1:
+            return
+        unreachable = self.UNREACHABLE
+        targets = [(j, steps) for j, steps in enumerate(dist[b]) if steps < unreachable]
+        for row in dist:
+            to_a = row[a]
+            if to_a < unreachable:
+                to_a += 1
+                for j, steps in targets:
+                    if to_a + steps < row[j]:
+                        row[j] = to_a + steps
+
+    def copy(self):
+        graph = DoorGraph.__new__(DoorGraph)
+        graph.index = self.index.copy()
+        graph.coords = self.coords[:]
+        graph.exits = self.exits[:]
+        graph.dist = [row[:] for row in self.dist]
+        return graph
+
+    def distance(self, start, goal):
+        """Door steps from start to goal, or None if goal can't be reached"""
+        a = self.index.get(start)
+        b = self.index.get(goal)
+        if a is None or b is None or self.dist[a][b] == self.UNREACHABLE:
+            return None
+        return self.dist[a][b]
+
+    def path(self, start, goal):
+        """Shortest door path as a list of coordinates, start and goal included.
+
+        Ties go to the first door in Direction order, the same path a BFS
+        expanding doors in that order finds first.
+        """
+        if start == goal:
+            return [start]
+        steps = self.distance(start, goal)
+        if steps is None:
+            return None
+        b = self.index[goal]
+        node = self.index[start]
+        path = [start]
+        exits = self.exits
+        while steps:
+            steps -= 1
+            for slot in range(4 * node, 4 * node + 4):
+                next_node = exits[slot]
+                if next_node >= 0 and self.dist[next_node][b] == steps:
+                    node = next_node
+                    break
+            path.append(self.coords[node])
+        return path
+
+    def column(self, goal, limit=None):
+        """Map every coordinate that can reach goal (in at most `limit` steps) onto its distance"""
+        b = self.index.get(goal)
+        if b is None:
+            return {}
+        bound = self.UNREACHABLE if limit is None else limit + 1
+        return {self.coords[a]: row[b] for a, row in enumerate(self.dist) if row[b] < bound}
+
+    def row(self, start):
+        """Map every coordinate reachable from start onto its distance"""
+        a = self.index.get(start)
+        if a is None:
+            return {}
+        unreachable = self.UNREACHABLE
+        return {self.coords[b]: steps for b, steps in enumerate(self.dist[a]) if steps < unreachable}
+
+class SparseDoorGraph:
+    """Door graph for large floors: just the doors, searched breadth-first when asked.
+
+    DoorGraph's all-pairs table grows with the square of the tile count,
+    which a floor of thousands of tiles can't afford. This answers the same
+    queries (with the same tie-breaking) from searches over the explored
+    tiles, each cached until the graph next changes.
+    """
+    def __init__(self):
+        self.index = {}
+        self.coords = []
+        self.exits = array('i')    # 4 slots per node: neighbor node (or -1) per Direction, in Direction order
+        self.entries = array('i')  # 4 slots per node: the node that steps in here moving in each Direction
+        self.searches = {}
+
+    def add_node(self, coord):
+        node = len(self.coords)
+        self.index[coord] = node
+        self.coords.append(coord)
+        self.exits.extend((-1, -1, -1, -1))
+        self.entries.extend((-1, -1, -1, -1))
+        self.searches.clear()
+        return node
+
+    def add_edge(self, from_coord, direction, to_coord):
+        a = self.index[from_coord]
+        b = self.index[to_coord]
+        slot = DIRECTIONS.index(direction)
+        self.exits[4 * a + slot] = b
+        self.entries[4 * b + slot] = a
+        self.searches.clear()
+
+    def search(self, coord, links, limit=None):
+        """{node: steps} from coord over `links` (exits for forward, entries for backward),
+        stopping `limit` steps out if given"""
+        key = (coord, links is self.exits, limit)
+        steps = self.searches.get(key)
+        if steps is None:
+            node = self.index.get(coord)
+            steps = {} if node is None else {node: 0}
+            queue = deque(steps)
+            while queue:
+                node = queue.popleft()
+                if steps[node] == limit:
+                    continue
+                for slot in range(4 * node, 4 * node + 4):
+                    neighbor = links[slot]
+                    if neighbor >= 0 and neighbor not in steps:
+                        steps[neighbor] = steps[node] + 1
+                        queue.append(neighbor)
+            self.searches[key] = steps
+        return steps
+
+    def distance(self, start, goal):
+        """Door steps from start to goal, or None if goal can't be reached"""
+        b = self.index.get(goal)
+        return None if b is None else self.search(start, self.exits).get(b)
+
+    def path(self, start, goal):
+        """Shortest door path as a list of coordinates, start and goal included"""
+        to_goal = self.search(goal, self.entries)
+        node = self.index.get(start)
+        if node not in to_goal:
+            return None
+        path = [start]
+        steps = to_goal[node]
+        exits = self.exits
+        while steps:
+            steps -= 1
+            for slot in range(4 * node, 4 * node + 4):
+                next_node = exits[slot]
+                if next_node >= 0 and to_goal.get(next_node) == steps:
+                    node = next_node
+                    break
+            path.append(self.coords[node])
+        return path
+
+    def column(self, goal, limit=None):
+        """Map every coordinate that can reach goal (in at most `limit` steps) onto its distance"""
+        return {self.coords[a]: steps for a, steps in self.search(goal, self.entries, limit).items()}
+
+    def row(self, start):
+        """Map every coordinate reachable from start onto its distance"""
+        return {self.coords[b]: steps for b, steps in self.search(start, self.exits).items()}
+
+    def copy(self):
+        graph = SparseDoorGraph.__new__(SparseDoorGraph)
+        graph.index = self.index.copy()
+        graph.coords = self.coords[:]
+        graph.exits = self.exits[:]
+        graph.entries = self.entries[:]
+        graph.searches = {}
+        return graph
+
+# randint(1, 6) takes the top three bits of one 32-bit word and redraws on 6 or 7;
+# these do the same to a whole batch of words at once
+D6_FACES = bytes((byte >> 5) + 1 for byte in range(256))
+D6_REJECTED = bytes(range(192, 256))
+
+class DiceBuffer:
+    """d6 rolls generated in bulk from a seeded stream.
+
+    Gives exactly the rolls random.Random(seed).randint(1, 6) would, one
+    getrandbits call per batch. Short streams (a floor's layout, say) keep
+    only the seed and the number of words used between batches rather than a
+    whole generator state; streams that keep rolling hold on to the generator.
+    """
+    __slots__ = ('seed', 'words_used', 'batch', '_rng', '_rolls', '_next')
+
+    # Words drawn before the generator is kept instead of rebuilt for each batch
+    KEEP_AFTER = 192
+
+    def __init__(self, seed, batch=64):
+        self.seed = seed
+        self.words_used = 0
+        self.batch = batch
+        self._rng = None
+        self._rolls = iter(b'')
+        self._next = self._rolls.__next__
+
+    def refill(self):
+        rng = self._rng
+        if rng is None:
+            rng = random.Random(self.seed)
+            if self.words_used:
+                rng.getrandbits(32 * self.words_used)
+        rolls = b''
+        while not rolls:
+            words = rng.getrandbits(32 * self.batch).to_bytes(4 * self.batch, 'little')
+            rolls = words[3::4].translate(D6_FACES, D6_REJECTED)
+            self.words_used += self.batch
+        self._rolls = iter(rolls)
+        self._next = self._rolls.__next__
+        if self.words_used >= self.KEEP_AFTER:
+            self._rng = rng
+            self.batch = 1024
+        else:
+            self.batch *= 2
+
+    def roll(self):
+        try:
+            return self._next()
+        except StopIteration:
+            self.refill()
+            return self._next()
+
+    def copy(self):
+        """A buffer that goes on to roll exactly what this one would, independently of it"""
+        # A bytes iterator can't be copied, so both sides get a fresh one over what is left
+        rest = bytes(self._rolls)
+        self._rolls = iter(rest)
+        self._next = self._rolls.__next__
+        dice = DiceBuffer(self.seed, self.batch)
+        # The generator is rebuilt from the seed only if the copy runs out of rolls
+        dice.words_used = self.words_used
+        dice._rolls = iter(rest)
+        dice._next = dice._rolls.__next__
+        return dice
+
+class RandomStreams:
+    """Independent random streams derived from one game seed, one per purpose.
+
+    Keeping layout, population, loot and combat apart means a rule change that
+    alters how many rolls one of them uses leaves the others untouched.
+    """
+    def __init__(self, seed):
+        self.seed = seed
+
+    def name(self, purpose, *key):
+        return ":".join(map(str, (self.seed, purpose) + key))
+
+    def stream(self, purpose, *key):
+        return random.Random(self.name(purpose, *key))
+
+    def dice(self, purpose, *key):
+        return DiceBuffer(self.name(purpose, *key))
+
+    def tile_dice(self, purpose, floor_level, x, y):
+        return TileDice(self.name(purpose, floor_level, x, y))
+
+class TileDice:
+    """d6 rolls for one tile, hashed from a stream name that ends in the tile's coordinates.
+
+    Unlike a DiceBuffer there is no generator to seed, so making one per tile
+    is cheap, and the rolls depend on nothing but the name.
+    """
+    __slots__ = ('name', 'blocks', '_next')
+
+    def __init__(self, name):
+        self.name = name
+        self.blocks = 0
+        self._next = iter(b'').__next__
+
+    def roll(self):
+        try:
+            return self._next()
+        except StopIteration:
+            digest = hashlib.blake2b(f"{self.name}:{self.blocks}".encode(), digest_size=16).digest()
+            self.blocks += 1
+            self._next = iter(digest.translate(D6_FACES, D6_REJECTED)).__next__
+            return self.roll()
+
+@lru_cache(maxsize=1 << 16)
+def zobrist_key(*parts):
+    """Fixed random 64-bit key for one feature of the game state, e.g. ('door', cell, mask)"""
+    return random.Random(repr(parts)).getrandbits(64)
+
+def tile_zobrist(tile):
+    """XOR of the keys of everything on a tile: type, doors, revealed, monster and loot"""
+    cell = (tile.x, tile.y)
+    key = zobrist_key('tile', cell, tile.type) ^ zobrist_key('doors', cell, tile.door_mask)
+    if tile.revealed:
+        key ^= zobrist_key('revealed', cell)
+    monster = tile.monster
+    if monster:
+        key ^= zobrist_key('monster', cell, monster.type, monster.hp)
+    loot = tile.loot
+    if isinstance(loot, Gem):
+        key ^= zobrist_key('gem', cell, loot.color)
+    elif loot:
+        key ^= zobrist_key('gear', cell, loot.type, loot.bonus, loot.is_adamantine)
+    return key
+
 class Dungeon:
-    def __init__(self, floor_level=1):
+    def __init__(self, floor_level=1, compact=False, events=None, streams=None, radius=FLOOR_RADIUS,
+                 hashed=False):
         self.floor_level = floor_level
-        self.grid = {}
+        # Tiles go at most `radius` steps from the start; floors that fit in one chunk
+        # keep flat per-cell arrays, larger ones only store what has been explored
+        self.radius = radius
+        self.side = 2 * radius + 1
+        self.small = self.side <= CHUNK_SIZE
+        if streams is None:
+            streams = RandomStreams(random.getrandbits(64))
+        self.streams = streams
+        # Hashed floors roll each tile from (seed, floor, x, y) instead of in the order tiles
+        # are made, so the same seed gives the same floor whichever way it is explored
+        self.hashed = hashed
+        self.layout_dice = streams.dice('layout', floor_level)
+        self.population_dice = streams.dice('population', floor_level)
+        self.loot_dice = streams.dice('loot', floor_level)
+        # TileGenerated events go here when an EventBus is supplied
+        self.events = events
+        # A CompactGrid covers the whole floor with flat arrays; a ChunkedGrid allocates them as needed
+        self.grid = self.compact_store() if compact else {}
         self.player_start = (0, 0)
         self.lair_location = None
         self.lair_revealed = False
+        # Where the lair will be on a hashed floor, and tiles already built for it (see build_region)
+        self.lair_cell = self.roll_lair_cell() if hashed else None
+        self.prebuilt = {}
+        # Bumped whenever a tile or door is added, so cached path data knows when it is stale
+        self.version = 0
+        self.paths = DoorGraph() if self.small else SparseDoorGraph()
+        self._field_key = None
+        self._field = None
+        # Zobrist hash of the floor, kept up to date through rehash() as tiles change;
+        # tile_keys holds each tile's current share of it, by cell()
+        self.zobrist = zobrist_key('floor', floor_level)
+        self.tile_keys = array('Q', bytes(8 * self.side * self.side)) if self.small else defaultdict(int)
+        # Open doors leading to places a move could still generate a tile: (x, y) -> DOOR_BITS mask
+        self.frontier = {}
+        # Living monsters by position and by identity; slain ones stay on their tile but leave these
+        self.monsters = {}
+        self.monster_positions = {}
+        # Monsters further than this from the player sleep (None wakes all; see active_monsters)
+        self.activation_radius = None if self.small else ACTIVATION_RADIUS
+        self._active_key = None
+        self._active_field = None
+        # (x, y, version) of the last Game.reveal_vision on this floor
+        self.vision = None
+        # Tiles on the floor not revealed yet, kept by rehash()
+        self.unrevealed = set()
+        # (min_x, max_x, min_y, max_y) of the revealed tiles, and on large floors the number
+        # revealed in each MINIMAP_BLOCK square, so drawing never has to scan the floor
+        self.bounds = None
+        self.revealed_blocks = None if self.small else {}
         self.generate_starting_room()
         
     def generate_starting_room(self):
         # Generate the starting room
         start_x, start_y = self.player_start
         start_tile = Tile(start_x, start_y, TileType.EMPTY, TileShape.ALL_WAY)
-        self.grid[(start_x, start_y)] = start_tile
 
         # All directions have doors in the starting room
         for direction in Direction:
             start_tile.add_door(direction)
+        start_tile = self.add_tile(start_tile)
 
         # Reveal the starting room
         start_tile.revealed = True
+        self.rehash(start_tile)
         # Generate ONLY the 4 adjacent tiles with proper shapes
         for direction in Direction:
             dx, dy = direction.value
@@ -546,17 +1739,22 @@ class Dungeon:
 
             # Check distance limit
             distance = max(abs(new_x), abs(new_y))
-            if distance <= 4:
+            if self.hashed:
+                adjacent_tile = self.generate_tile(new_x, new_y)
+                if adjacent_tile:
+                    adjacent_tile.revealed = True
+                    self.rehash(adjacent_tile)
+            elif distance <= self.radius:
                 # Roll for tile shape based on card system
                 shape = self.roll_tile_shape()
                 # Dead-end tiles should always include stairs
                 tile_type = TileType.STAIRS if shape == TileShape.DEAD_END else TileType.EMPTY
                 adjacent_tile = Tile(new_x, new_y, tile_type, shape)
-                self.grid[(new_x, new_y)] = adjacent_tile
 
                 # Configure doors based on shape and entrance direction
                 entrance_direction = self.get_opposite_direction(direction)
                 adjacent_tile.configure_doors_from_shape(entrance_direction)
+                adjacent_tile = self.add_tile(adjacent_tile)
 
                 # Populate the adjacent tile (stairs dond't get populated)
                 if tile_type != TileType.STAIRS:
@@ -564,12 +1762,13 @@ class Dungeon:
 
                 # Reveal these starting tiles
                 adjacent_tile.revealed = True
+                self.rehash(adjacent_tile)
         
 
 
     def roll_tile_shape_for_entrance(self, entrance_direction):
         """Roll for tile shape that makes sense with the entrance direction"""
-        roll = random.randint(1, 6)
+        roll = self.layout_dice.roll()
         
         # Ensure the shape makes sense with how we entered
         if roll == 1:
@@ -591,26 +1790,203 @@ class Dungeon:
         if tile.type in [TileType.STAIRS, TileType.LAIR]:
             return
             
-        roll = random.randint(1, 6)
+        roll = self.population_dice.roll()
         if roll in [1, 2]:  # Monster
-            tile.monster = self.generate_monster()
+            self.place_monster(tile, self.generate_monster())
         elif roll in [5, 6]:  # Loot
             tile.loot = self.generate_loot()
+        self.rehash(tile)
 
     def populate_lair(self, tile):
         """Populate a lair tile with a boss monster and special loot."""
-        if self.floor_level <= 5:
-            tile.monster = Monster(MonsterType.MINOTAUR, self.floor_level)
-        else:
-            tile.monster = Monster(MonsterType.DRAGON, self.floor_level)
+        self.place_monster(tile, self.lair_boss())
         # Lair has special loot
-        tile.loot = self.generate_gear()
-        if isinstance(tile.loot, Gear):
-            tile.loot.is_adamantine = True
+        tile.loot = self.lair_loot()
+        self.rehash(tile)
+
+    def lair_boss(self):
+        return Monster(self.lair_boss_type(), self.floor_level)
+
+    def lair_boss_type(self):
+        return MonsterType.MINOTAUR if self.floor_level <= 5 else MonsterType.DRAGON
+
+    def lair_loot(self, dice=None):
+        return self.generate_gear(dice, adamantine=True)
+
+    def roll_lair_cell(self):
+        """Where a hashed floor's lair goes: one of the 4 * radius tiles exactly radius steps out"""
+        digest = hashlib.blake2b(self.streams.name('lair', self.floor_level).encode(), digest_size=8).digest()
+        side, step = divmod(int.from_bytes(digest, 'little') % (4 * self.radius), self.radius)
+        x, y = self.radius - step, step
+        for _ in range(side):
+            x, y = -y, x
+        return (x, y)
+
+    def tile_layout(self, x, y):
+        """(shape, facing, door mask) a hashed floor rolls for (x, y), before neighbours add their doors"""
+        distance = abs(x) + abs(y)
+        if distance > self.radius:
+            return None, None, 0
+        if (x, y) == self.player_start:
+            return TileShape.ALL_WAY, None, ALL_DOORS
+        if distance == self.radius:
+            # Stairs and the lair only get the doors their neighbours lead in through
+            return TileShape.DEAD_END, None, 0
+        dice = self.streams.tile_dice('layout', self.floor_level, x, y)
+        shape = self.roll_tile_shape(dice)
+        roll = dice.roll()
+        while roll > 4:
+            roll = dice.roll()
+        facing = DIRECTIONS[roll - 1]
+        tile = Tile(x, y, TileType.EMPTY, shape)
+        tile.configure_doors_from_shape(facing)
+        return shape, facing, tile.door_mask | self.lair_path_doors(x, y)
+
+    def lair_path_doors(self, x, y):
+        """Doors a hashed floor always opens at (x, y) so that the lair can be walked to.
+
+        Rolled doors alone can wall the lair off, so the tiles from the start
+        along the x axis to the lair's column, then up or down it to the lair,
+        each get doors to the tiles before and after them on that path.
+        """
+        lair_x, lair_y = self.lair_cell
+        if y == 0 and x * lair_x >= 0 and abs(x) <= abs(lair_x):
+            step = abs(x)
+        elif x == lair_x and y * lair_y > 0 and abs(y) <= abs(lair_y):
+            step = abs(lair_x) + abs(y)
+        else:
+            return 0
+        mask = 0
+        for other in (step - 1, step + 1):
+            if 0 <= other <= self.radius:
+                if other <= abs(lair_x):
+                    other_x, other_y = (other if lair_x > 0 else -other), 0
+                else:
+                    other_x, other_y = lair_x, (other - abs(lair_x)) * (1 if lair_y > 0 else -1)
+                mask |= DOOR_BITS[Direction((other_x - x, other_y - y))]
+        return mask
+
+    def build_tile(self, x, y):
+        """The tile at (x, y) of a hashed floor, worked out from the seed, floor and (x, y) alone.
+
+        Its doors are its own roll plus a door back to each neighbour whose
+        roll opens towards it, so neighbouring tiles always agree. Returns None
+        beyond the floor's radius. The tile is not placed on the floor.
+        """
+        shape, facing, mask = self.tile_layout(x, y)
+        if shape is None:
+            return None
+        for direction in DIRECTIONS:
+            dx, dy = direction.value
+            if self.tile_layout(x + dx, y + dy)[2] & DOOR_BITS[self.get_opposite_direction(direction)]:
+                mask |= DOOR_BITS[direction]
+
+        if abs(x) + abs(y) == self.radius:
+            tile_type = TileType.LAIR if (x, y) == self.lair_cell else TileType.STAIRS
+        elif shape == TileShape.DEAD_END:
+            tile_type = TileType.STAIRS
+        else:
+            tile_type = TileType.EMPTY
+        tile = Tile(x, y, tile_type, shape)
+        tile.door_mask = mask
+        tile.entrance_direction = facing
 
-    def roll_tile_shape(self):
+        loot_dice = self.streams.tile_dice('loot', self.floor_level, x, y)
+        # Monsters stay MonsterSpawns until generate_tile places the tile
+        if tile_type == TileType.LAIR:
+            tile.monster = MonsterSpawn(self.lair_boss_type(), self.floor_level)
+            tile.loot = self.lair_loot(loot_dice)
+        elif tile_type == TileType.EMPTY and (x, y) != self.player_start:
+            population_dice = self.streams.tile_dice('population', self.floor_level, x, y)
+            roll = population_dice.roll()
+            if roll in [1, 2]:  # Monster
+                tile.monster = MonsterSpawn(self.roll_monster_type(population_dice), self.floor_level)
+            elif roll in [5, 6]:  # Loot
+                tile.loot = self.generate_loot(loot_dice)
+        return tile
+
+    def generate_tile(self, x, y):
+        """Place the tile at (x, y) of a hashed floor, prebuilt or built now; None beyond the radius"""
+        tile = self.prebuilt.pop((x, y), None)
+        if tile is None:
+            tile = self.build_tile(x, y)
+            if tile is None:
+                return None
+        if tile.type == TileType.LAIR:
+            self.lair_location = (x, y)
+        monster = tile.monster
+        if monster:
+            monster = tile.monster = monster.build()
+        tile = self.add_tile(tile)
+        if monster:
+            self.place_monster(tile, monster)
+        return tile
+
+    def prebuild(self, tiles):
+        """Keep tiles built ahead of time (by build_region, say) until play reaches them"""
+        for tile in tiles:
+            if (tile.x, tile.y) not in self.grid:
+                self.prebuilt[(tile.x, tile.y)] = tile
+
+    def place_monster(self, tile, monster):
+        coord = (tile.x, tile.y)
+        old = self.monsters.pop(coord, None)
+        if old is not None:
+            del self.monster_positions[old]
+        tile.monster = monster
+        self.monsters[coord] = monster
+        self.monster_positions[monster] = coord
+
+    def move_monster(self, from_tile, to_tile):
+        monster = from_tile.monster
+        from_tile.monster = None
+        to_tile.monster = monster
+        coord = (to_tile.x, to_tile.y)
+        del self.monsters[(from_tile.x, from_tile.y)]
+        self.monsters[coord] = monster
+        self.monster_positions[monster] = coord
+        self.rehash(from_tile)
+        self.rehash(to_tile)
+
+    def remove_monster(self, monster):
+        """Take a slain monster out of the registry; its body stays on the tile"""
+        del self.monsters[self.monster_positions.pop(monster)]
+
+    def living_monsters(self):
+        """(coord, monster) for every living monster, in the order their tiles were made"""
+        index = self.paths.index
+        return sorted(self.monsters.items(), key=lambda item: index[item[0]])
+
+    def active_monsters(self, goal):
+        """The field of door steps to `goal` within the activation radius, and the living
+        monsters inside it in the order their tiles were made.
+
+        Monsters outside sleep. The field is searched out from the goal only as
+        far as the radius, so a turn costs the same however big the floor has
+        grown; a monster wakes once the player comes within reach or a new door
+        brings it closer. Distances inside the field are exact, so awake
+        monsters chase just as they would with the whole floor's field.
+        """
+        if self.activation_radius is None:
+            field = self.distance_field(goal)
+            return field, self.living_monsters()
+        key = (goal, self.version, self.activation_radius)
+        if key != self._active_key:
+            self._active_key = key
+            self._active_field = self.paths.column(goal, self.activation_radius)
+        field = self._active_field
+        monsters = self.monsters
+        if len(field) < len(monsters):
+            awake = [(coord, monsters[coord]) for coord in field if coord in monsters]
+        else:
+            awake = [(coord, monster) for coord, monster in monsters.items() if coord in field]
+        index = self.paths.index
+        awake.sort(key=lambda item: index[item[0]])
+        return field, awake
+
+    def roll_tile_shape(self, dice=None):
         """Roll for tile shape based on card system from rulesheet"""
-        roll = random.randint(1, 6)
+        roll = (dice or self.layout_dice).roll()
         
         if roll == 1:
             return TileShape.DEAD_END    # Aces - Dead-end/Stairs
@@ -625,57 +2001,226 @@ class Dungeon:
         else:  # roll == 6
             return TileShape.ALL_WAY     # Royals - All-way
 
-    def generate_monster(self):
-        roll = random.randint(1, 6)
+    def generate_monster(self, dice=None):
+        return Monster(self.roll_monster_type(dice), self.floor_level)
+
+    def roll_monster_type(self, dice=None):
+        roll = (dice or self.population_dice).roll()
         if roll in [1, 2, 3]:
-            return Monster(MonsterType.GOBLIN, self.floor_level)
+            return MonsterType.GOBLIN
         elif roll in [4, 5]:
-            return Monster(MonsterType.SKELETON, self.floor_level)
+            return MonsterType.SKELETON
         else:  # roll == 6
             if self.floor_level <= 5:
-                return Monster(MonsterType.MINOTAUR, self.floor_level)
+                return MonsterType.MINOTAUR
             else:
-                return Monster(MonsterType.DRAGON, self.floor_level)
+                return MonsterType.DRAGON
 
-    def generate_loot(self):
-        roll = random.randint(1, 6)
+    def generate_loot(self, dice=None):
+        roll = (dice or self.loot_dice).roll()
         if roll == 1:
-            return Gear(GearType.SHIELD, self.floor_level)
+            return GearSpawn(GearType.SHIELD, self.floor_level)
         elif roll in [2, 3, 4]:
             gem_color = [GemColor.GREEN, GemColor.BLUE, GemColor.PURPLE][roll - 2]
             return Gem(gem_color, self.floor_level)
         else:  # roll in [5, 6]
-            return self.generate_gear()
+            return self.generate_gear(dice)
 
-    def generate_gear(self):
-        roll = random.randint(1, 6)
+    def generate_gear(self, dice=None, adamantine=False):
+        """Roll gear for a tile; it stays a GearSpawn until someone picks it up"""
+        roll = (dice or self.loot_dice).roll()
         if roll == 1:
-            return Gear(GearType.HELM, self.floor_level)
+            return GearSpawn(GearType.HELM, self.floor_level, adamantine)
         elif roll == 2:
-            return Gear(GearType.CHEST, self.floor_level)
+            return GearSpawn(GearType.CHEST, self.floor_level, adamantine)
         elif roll == 3:
-            return Gear(GearType.CROSSBOW, self.floor_level)
+            return GearSpawn(GearType.CROSSBOW, self.floor_level, adamantine)
         elif roll == 4:
-            return Gear(GearType.SWORD, self.floor_level)
+            return GearSpawn(GearType.SWORD, self.floor_level, adamantine)
         elif roll == 5:
-            return Gear(GearType.GREATBOW, self.floor_level)
+            return GearSpawn(GearType.GREATBOW, self.floor_level, adamantine)
         else:  # roll == 6
-            return Gear(GearType.GREATSWORD, self.floor_level)
+            return GearSpawn(GearType.GREATSWORD, self.floor_level, adamantine)
         
     def reveal_tile(self, x, y):
         """Reveal a tile if it exists, return the tile or None"""
         if (x, y) in self.grid:
             tile = self.grid[(x, y)]
-            tile.revealed = True
+            if not tile.revealed:
+                tile.revealed = True
+                self.rehash(tile)
             
-            # Handle lair special case
+            # Handle lair special case (hashed lairs are stocked when they are built)
             if tile.type == TileType.LAIR and not self.lair_revealed:
                 self.lair_revealed = True
-                self.populate_lair(tile)
+                if not self.hashed:
+                    self.populate_lair(tile)
             
             return tile
         return None
     
+    def copy(self, events=None, streams=None):
+        """An independent copy of this floor, reporting to `events`.
+
+        With `streams`, rolls still to come on this floor are drawn from those
+        streams instead of continuing this floor's.
+        """
+        dungeon = Dungeon.__new__(Dungeon)
+        dungeon.__dict__.update(self.__dict__)
+        if streams is None:
+            dungeon.layout_dice = self.layout_dice.copy()
+            dungeon.population_dice = self.population_dice.copy()
+            dungeon.loot_dice = self.loot_dice.copy()
+        else:
+            dungeon.layout_dice = streams.dice('layout', self.floor_level)
+            dungeon.population_dice = streams.dice('population', self.floor_level)
+            dungeon.loot_dice = streams.dice('loot', self.floor_level)
+        dungeon.events = events
+        if streams is None:
+            dungeon.prebuilt = {coord: tile.copy() for coord, tile in self.prebuilt.items()}
+        else:
+            # Tiles not made yet come from the new streams, the lair too if it hasn't been found
+            dungeon.streams = streams
+            dungeon.prebuilt = {}
+            if self.hashed and self.lair_location is None:
+                dungeon.lair_cell = dungeon.roll_lair_cell()
+        if isinstance(self.grid, dict):
+            dungeon.grid = {coord: tile.copy() for coord, tile in self.grid.items()}
+        else:
+            dungeon.grid = self.grid.copy()
+        dungeon.paths = self.paths.copy()
+        dungeon.tile_keys = self.tile_keys[:] if self.small else self.tile_keys.copy()
+        dungeon.frontier = self.frontier.copy()
+        dungeon.unrevealed = self.unrevealed.copy()
+        if not self.small:
+            dungeon.revealed_blocks = self.revealed_blocks.copy()
+        dungeon.monsters = {coord: dungeon.grid[coord].monster for coord in self.monsters}
+        dungeon.monster_positions = {monster: coord for coord, monster in dungeon.monsters.items()}
+        return dungeon
+
+    def compact_store(self):
+        if self.small:
+            return CompactGrid(-self.radius, -self.radius, self.side, self.side)
+        return ChunkedGrid()
+
+    def compact(self):
+        """Move this floor's tiles into a CompactGrid (or ChunkedGrid) to cut its memory footprint"""
+        if not isinstance(self.grid, dict):
+            return
+        store = self.compact_store()
+        for coord, tile in self.grid.items():
+            store[coord] = tile
+        self.grid = store
+
+    def add_tile(self, tile):
+        """Place a tile (with its doors already configured) on the floor.
+
+        Returns the tile as stored, which for a CompactGrid is a view rather
+        than the object passed in.
+        """
+        coord = (tile.x, tile.y)
+        self.grid[coord] = tile
+        tile = self.grid[coord]
+        self.version += 1
+        self.rehash(tile)
+        self.paths.add_node(coord)
+        for direction in Direction:
+            dx, dy = direction.value
+            neighbor = self.grid.get((tile.x + dx, tile.y + dy))
+            if neighbor:
+                if tile.has_door(direction):
+                    self.paths.add_edge(coord, direction, (neighbor.x, neighbor.y))
+                back = self.get_opposite_direction(direction)
+                if neighbor.has_door(back):
+                    self.paths.add_edge((neighbor.x, neighbor.y), back, coord)
+                    self.close_frontier((neighbor.x, neighbor.y), back)
+            elif tile.has_door(direction):
+                self.open_frontier(coord, direction)
+        if self.events is not None:
+            self.events.emit(TileGenerated, self.floor_level, tile.x, tile.y, tile.type, tile.shape)
+        return tile
+
+    def open_door(self, tile, direction):
+        """Open a door on a tile that is already on the floor"""
+        if not tile.has_door(direction):
+            tile.add_door(direction)
+            self.version += 1
+            self.rehash(tile)
+            dx, dy = direction.value
+            neighbor = (tile.x + dx, tile.y + dy)
+            if neighbor in self.grid:
+                self.paths.add_edge((tile.x, tile.y), direction, neighbor)
+            else:
+                self.open_frontier((tile.x, tile.y), direction)
+
+    def open_frontier(self, coord, direction):
+        dx, dy = direction.value
+        # Moving only generates tiles up to radius steps from the start (see Game.generate_new_tile)
+        if abs(coord[0] + dx) + abs(coord[1] + dy) <= self.radius:
+            self.frontier[coord] = self.frontier.get(coord, 0) | DOOR_BITS[direction]
+
+    def close_frontier(self, coord, direction):
+        mask = self.frontier.get(coord, 0) & ~DOOR_BITS[direction]
+        if mask:
+            self.frontier[coord] = mask
+        else:
+            self.frontier.pop(coord, None)
+
+    def frontier_doors(self):
+        """(coord, direction) for every open door that leads to a tile not generated yet"""
+        return [(coord, direction) for coord, mask in self.frontier.items()
+                for direction in DIRECTIONS if mask & DOOR_BITS[direction]]
+
+    def vision_current(self, x, y):
+        """Whether vision from (x, y) was worked out since the floor last gained a tile or door"""
+        return self.vision == (x, y, self.version)
+
+    def cell(self, x, y):
+        """Slot of (x, y) in tile_keys: an index on small floors, the coordinate itself on large ones"""
+        if self.small:
+            return (y + self.radius) * self.side + x + self.radius
+        return (x, y)
+
+    def rehash(self, tile):
+        """Fold a tile's changes into the floor's Zobrist hash; call after changing anything on it"""
+        x, y = tile.x, tile.y
+        cell = self.cell(x, y)
+        if tile.revealed:
+            if not self.small and ((x, y) in self.unrevealed or cell not in self.tile_keys):
+                block = (x // MINIMAP_BLOCK, y // MINIMAP_BLOCK)
+                self.revealed_blocks[block] = self.revealed_blocks.get(block, 0) + 1
+            self.unrevealed.discard((x, y))
+            bounds = self.bounds
+            if bounds is None:
+                self.bounds = (x, x, y, y)
+            elif not (bounds[0] <= x <= bounds[1] and bounds[2] <= y <= bounds[3]):
+                self.bounds = (min(bounds[0], x), max(bounds[1], x), min(bounds[2], y), max(bounds[3], y))
+        else:
+            self.unrevealed.add((x, y))
+        key = tile_zobrist(tile)
+        self.zobrist ^= self.tile_keys[cell] ^ key
+        self.tile_keys[cell] = key
+
+    def compute_zobrist(self):
+        """The floor's Zobrist hash worked out from scratch, to check the running one against"""
+        key = zobrist_key('floor', self.floor_level)
+        for tile in self.grid.values():
+            key ^= tile_zobrist(tile)
+        return key
+
+    def distance_field(self, goal):
+        """Map every tile that can walk to `goal` through doors onto its step count.
+
+        Read from the door graph's distance table and cached until the goal
+        moves or the floor gains a tile or door, so monsters can share it
+        instead of each searching for the player on their own.
+        """
+        key = (goal, self.version)
+        if key != self._field_key:
+            self._field_key = key
+            self._field = self.paths.column(goal)
+        return self._field
+
     def ensure_two_way_connection(self, from_x, from_y, to_x, to_y, direction):
         """Ensure that if tile A connects to tile B, tile B connects back to tile A"""
         from_tile = self.grid.get((from_x, from_y))
@@ -683,9 +2228,9 @@ class Dungeon:
         
         if from_tile and to_tile:
             # If from_tile has a door in this direction, to_tile should have door in opposite direction
-            if from_tile.doors.get(direction):
+            if from_tile.has_door(direction):
                 opposite_dir = self.get_opposite_direction(direction)
-                to_tile.doors[opposite_dir] = True
+                self.open_door(to_tile, opposite_dir)
 
     def get_opposite_direction(self, direction):
         opposites = {
@@ -696,19 +2241,252 @@ class Dungeon:
         }
         return opposites[direction]
 
+ANSI_SGR = re.compile(r'\033\[[0-9;]*m')
+BLANK_CELL = ('', ' ')
+
+def text_cells(text):
+    """Split text with ANSI colors into (color code, character) screen cells.
+
+    Double-width characters are followed by an empty placeholder cell so that
+    cell positions keep matching terminal columns.
+    """
+    cells = []
+    sgr = ''
+    pos = 0
+    for match in list(ANSI_SGR.finditer(text)) + [None]:
+        end = match.start() if match else len(text)
+        for ch in text[pos:end]:
+            cells.append((sgr, ch))
+            if unicodedata.east_asian_width(ch) in ('W', 'F'):
+                cells.append(('', ''))
+        if match:
+            sgr = '' if match.group() == Colors.RESET else match.group()
+            pos = match.end()
+    return cells
+
+def build_region(seed, floor_level, x0, y0, x1, y1, radius=FLOOR_RADIUS):
+    """The tiles of a hashed floor in the box from (x0, y0) to (x1, y1), built on their own.
+
+    Nothing from a game in progress is needed, so boxes can be built in worker
+    processes and the tiles handed to that game's Dungeon.prebuild().
+    """
+    dungeon = Dungeon(floor_level, streams=RandomStreams(seed), radius=radius, hashed=True)
+    tiles = (dungeon.build_tile(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1))
+    return [tile for tile in tiles if tile is not None]
+
+# Columns kept free to the right of the map for the status panel
+PANEL_WIDTH = 32
+
+class ScreenRenderer:
+    """Full-screen renderer for the alternate terminal screen.
+
+    Each frame is drawn into a back buffer of cells and compared with the
+    front buffer, which holds what the terminal already shows. Only changed
+    cells are written, using cursor addressing, and then the buffers swap.
+    The screen holds the map, a status panel to its right and a bounded
+    message pane along the bottom.
+    """
+    def __init__(self, out=None, size=None, message_lines=8):
+        self.out = out or sys.stdout
+        self.size = size
+        self.messages = deque(maxlen=message_lines)
+        self.width = self.height = 0
+        self.front = None  # None forces a full redraw
+
+    def __enter__(self):
+        # Alternate screen, hidden cursor
+        self.out.write('\033[?1049h\033[?25l')
+        self.front = None
+        return self
+
+    def __exit__(self, *exc_info):
+        self.out.write(Colors.RESET + '\033[?25h\033[?1049l')
+        self.out.flush()
+
+    def add_message(self, text):
+        for line in text.split('\n'):
+            if line:
+                self.messages.append(line)
+
+    def blank_buffer(self):
+        return [[BLANK_CELL] * self.width for _ in range(self.height)]
+
+    def put_text(self, buffer, x, y, text):
+        if not 0 <= y < len(buffer):
+            return
+        row = buffer[y]
+        for cell in text_cells(text):
+            if x >= self.width:
+                break
+            row[x] = cell
+            x += 1
+
+    def compose(self, game, prompt=''):
+        """Draw a whole frame into a new back buffer"""
+        width, height = self.size or shutil.get_terminal_size((100, 40))
+        if (width, height) != (self.width, self.height):
+            self.width, self.height = width, height
+            self.front = None
+        back = self.blank_buffer()
+
+        # Map in the top left, through a camera sized to the space left by the
+        # status panel and the message pane
+        map_height = max(0, height - self.messages.maxlen - 2)
+        view = (max(1, (width - PANEL_WIDTH) // 5), max(1, (map_height - 1) // 3))
+        lines = [f"=== Floor {game.current_floor} ==="] + game.map_rows(view)
+        for y, line in enumerate(lines[:map_height]):
+            self.put_text(back, 0, y, line)
+
+        # Status panel to the right of the map, with the minimap under it
+        panel_x = max(len(text_cells(line)) for line in lines) + 2
+        panel = game.status_lines() + [''] + game.gear_lines()
+        if game.minimap:
+            panel += [''] + game.minimap_rows()
+        for y, line in enumerate(panel):
+            if y < map_height:
+                self.put_text(back, panel_x, y, line)
+
+        # Message pane and prompt along the bottom
+        top = height - self.messages.maxlen - 1
+        self.put_text(back, 0, top - 1, '-' * width)
+        for i, line in enumerate(self.messages):
+            self.put_text(back, 0, top + i, line)
+        self.put_text(back, 0, height - 1, prompt)
+        return back
+
+    def draw(self, game, prompt=''):
+        self.present(self.compose(game, prompt))
+
+    def present(self, back):
+        """Write the cells that differ from the front buffer, then swap buffers"""
+        parts = []
+        front = self.front
+        if front is None:
+            parts.append('\033[2J')
+            front = self.blank_buffer()
+        sgr = None
+        cursor = None
+        for y, (back_row, front_row) in enumerate(zip(back, front)):
+            if back_row == front_row:
+                continue
+            for x, cell in enumerate(back_row):
+                # Placeholders behind double-width characters are never written themselves
+                if cell == front_row[x] or not cell[1]:
+                    continue
+                if cursor != (y, x):
+                    parts.append(f'\033[{y + 1};{x + 1}H')
+                if cell[0] != sgr:
+                    sgr = cell[0]
+                    parts.append(Colors.RESET + sgr)
+                parts.append(cell[1])
+                cursor = (y, x + (2 if unicodedata.east_asian_width(cell[1]) in ('W', 'F') else 1))
+        if parts:
+            parts.append(Colors.RESET)
+            self.out.write(''.join(parts))
+            self.out.flush()
+        self.front = back
+
+    def ask(self, game, prompt):
+        """Show the prompt on the bottom row and read a line there"""
+        self.draw(game)
+        self.put_cursor_prompt(prompt)
+        try:
+            return input()
+        finally:
+            self.out.write('\033[?25l')
+            # The echoed input left the screen out of sync with the front buffer
+            self.front = None
+
+    def put_cursor_prompt(self, prompt):
+        self.out.write(f'\033[{self.height};1H\033[2K{prompt}\033[?25h')
+        self.out.flush()
+
 class Game:
-    def __init__(self):
-        self.player = Player()
+    def __init__(self, headless=False, compact=False, seed=None, radius=FLOOR_RADIUS, hashed=False):
+        # Headless games never touch the terminal: no prompts, prints or map rendering
+        self.headless = headless
+        # Compact games keep each floor in a CompactGrid instead of a dict of Tiles
+        self.compact = compact
+        # How far floors reach from their start; larger radii make "endless" floors
+        if radius < 1:
+            raise ValueError(f"Floor radius must be at least 1, not {radius}")
+        self.radius = radius
+        # Hashed games lay out every tile from its coordinates (see Dungeon.build_tile)
+        self.hashed = hashed
+        # Every roll in the game comes from streams derived from this seed
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.streams = RandomStreams(self.seed)
+        self.combat_dice = self.streams.dice('combat')
+        self.events = EventBus()
+        # Formats events for the terminal; the renderer redirects its output while it runs
+        self.text_sink = TextSink(print)
+        if not headless:
+            self.events.subscribe(self.text_sink)
+        self.player = Player(self.events)
         self.current_floor = 1
-        self.dungeon = Dungeon(self.current_floor)
+        self.dungeon = Dungeon(self.current_floor, self.compact, self.events, self.streams, self.radius, self.hashed)
         self.game_over = False
         self.victory = False
         self.monsters_attacked_this_turn = set()
         self.just_used_stairs = False
-        self.messages = []
+        self.turn = 0
+        # Set while a full-screen renderer owns the terminal
+        self.renderer = None
+        # Draw a minimap summary of the explored floor next to the map
+        self.minimap = False
+
+    def fork(self, seed=None):
+        """A cheap, independent headless copy of this game for lookahead.
+
+        Floors, monsters, gear and dice are copied, so playing one branch never
+        touches another. By default the fork's dice continue exactly as this
+        game's would; pass `seed` to have every roll from here on drawn from
+        that seed's streams instead, e.g. to sample different outcomes.
+        """
+        game = Game.__new__(Game)
+        game.__dict__.update(self.__dict__)
+        game.headless = True
+        game.events = EventBus()
+        game.text_sink = TextSink(print)
+        game.renderer = None
+        if seed is None:
+            game.combat_dice = self.combat_dice.copy()
+            streams = None
+        else:
+            game.seed = seed
+            game.streams = streams = RandomStreams(seed)
+            game.combat_dice = streams.dice('combat')
+        game.player = self.player.copy(game.events)
+        game.dungeon = self.dungeon.copy(game.events, streams)
+        game.monsters_attacked_this_turn = set()
+        return game
+
+    def state_hash(self):
+        """64-bit Zobrist hash of the game state: the floor's running hash plus the player's keys"""
+        player = self.player
+        key = (self.dungeon.zobrist ^ zobrist_key('at', player.x, player.y)
+               ^ zobrist_key('hp', player.current_hp, player.max_hp)
+               ^ zobrist_key('exp', player.level, player.exp))
+        for slot, item in player.gear.items():
+            if isinstance(item, Gear):
+                key ^= zobrist_key('equipped', slot, item.type, item.get_total_bonus(),
+                                   item.max_sockets - len(item.sockets))
+        return key
 
     def get_single_key(self):
         """Get a single key press and return as uppercase string"""
+        if msvcrt is None:
+            if termios is not None and sys.stdin.isatty():
+                # Read one key without waiting for Enter
+                fd = sys.stdin.fileno()
+                old_settings = termios.tcgetattr(fd)
+                try:
+                    tty.setcbreak(fd)
+                    return sys.stdin.read(1).upper()
+                finally:
+                    termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+            # No raw console available, fall back to line input
+            return input()[:1].upper()
         key = msvcrt.getch()
         return key.decode('utf-8').upper()
         
@@ -718,18 +2496,26 @@ class Game:
         # First, reveal vision from current position
         self.reveal_vision(self.player.x, self.player.y)
 
-        # Find map boundaries - include ALL revealed tiles
-        revealed_coords = [(x, y) for (x, y), tile in self.dungeon.grid.items() if tile.revealed]
-        all_coords = revealed_coords + [(self.player.x, self.player.y)]
-
-        if not all_coords:
-            all_coords = [(self.player.x, self.player.y)]
-
-        xs = [x for x, y in all_coords]
-        ys = [y for x, y in all_coords]
-
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
+        # Print the final map, cut down to what fits the terminal
+        width, height = shutil.get_terminal_size((100, 40))
+        for row in self.map_rows((width // 5, max(1, (height - 2) // 3))):
+            print(row)
+        if self.minimap:
+            for row in self.minimap_rows():
+                print(row)
+
+    def map_rows(self, view=None):
+        """Render the revealed map as printable rows, three per tile row.
+
+        `view` is a (columns, rows) size in tiles. Where the revealed area is
+        bigger than that, only a window of that size centred on the player is
+        drawn, so the work done depends on the view and not on the floor.
+        """
+        # Map boundaries take in every revealed tile and the player
+        px, py = self.player.x, self.player.y
+        min_x, max_x, min_y, max_y = self.dungeon.bounds or (px, px, py, py)
+        min_x, max_x = min(min_x, px), max(max_x, px)
+        min_y, max_y = min(min_y, py), max(max_y, py)
 
         # Add padding
         min_x -= 1
@@ -737,70 +2523,111 @@ class Game:
         min_y -= 1
         max_y += 1
 
-        # Build the composite map
+        # Follow the player with the camera, keeping it inside the boundaries
+        if view:
+            columns, rows = view
+            if max_x - min_x + 1 > columns:
+                min_x = max(min_x, min(px - columns // 2, max_x - columns + 1))
+                max_x = min_x + columns - 1
+            if max_y - min_y + 1 > rows:
+                min_y = max(min_y, min(py - rows // 2, max_y - rows + 1))
+                max_y = min_y + rows - 1
+
+        # Build the composite map from each tile's cached strip
         map_rows = []
+        grid = self.dungeon.grid
 
         for y in range(min_y, max_y + 1):
-            row_lines = [[], [], []]
+            top, middle, bottom = [], [], []
 
             for x in range(min_x, max_x + 1):
-                if (x, y) in self.dungeon.grid:
-                    tile = self.dungeon.grid[(x, y)]
-                    show_player = (x == self.player.x and y == self.player.y)
-                    tile_grid = tile.get_5x3_representation(show_player)
-
-                    for i in range(3):
-                        row_lines[i].extend(tile_grid[i])
+                tile = grid.get((x, y))
+                if tile:
+                    strip = tile.get_strip(x == self.player.x and y == self.player.y)
                 else:
-                    # Unexplored area
-                    unexplored_grid = [
-                        [' ', ' ', ' ', ' ', ' '],
-                        [' ', '?', ' ', ' ', ' '],
-                        [' ', ' ', ' ', ' ', ' ']
-                    ]
-                    for i in range(3):
-                        row_lines[i].extend(unexplored_grid[i])
-
-            # Add spacing between tiles (removed horizontal spacing for touching walls)
-            for i in range(3):
-                map_rows.append(''.join(row_lines[i]))
-
-        # Print the final map
-        for row in map_rows:
-            print(row)
-    
+                    strip = UNEXPLORED_STRIP
+                top.append(strip[0])
+                middle.append(strip[1])
+                bottom.append(strip[2])
+
+            # Tiles touch with no spacing so their walls line up
+            map_rows.append(''.join(top))
+            map_rows.append(''.join(middle))
+            map_rows.append(''.join(bottom))
+
+        return map_rows
+
+    def minimap_rows(self, columns=24, rows=8):
+        """A coarse map around the player, one character per MINIMAP_BLOCK square of tiles.
+
+        Shading shows how much of each square has been revealed, with @ on the
+        player's square. Only large floors keep the counts this is drawn from,
+        so on floors that fit in one chunk there is nothing to show.
+        """
+        blocks = self.dungeon.revealed_blocks
+        if not blocks:
+            return []
+        block_x, block_y = self.player.x // MINIMAP_BLOCK, self.player.y // MINIMAP_BLOCK
+        left, top = block_x - columns // 2, block_y - rows // 2
+        full = MINIMAP_BLOCK * MINIMAP_BLOCK
+        lines = ['+' + '-' * columns + '+']
+        for y in range(top, top + rows):
+            line = []
+            for x in range(left, left + columns):
+                if (x, y) == (block_x, block_y):
+                    line.append('@')
+                else:
+                    line.append(MINIMAP_SHADES[-(-4 * blocks.get((x, y), 0) // full)])
+            lines.append('|' + ''.join(line) + '|')
+        lines.append('+' + '-' * columns + '+')
+        return lines
+
     def display_player_status(self):
-        print(f"\nPlayer: Level {self.player.level}")
+        print()
+        for line in self.status_lines():
+            print(line)
+
+    def status_lines(self):
         hp_color = Colors.RESET
         if self.player.current_hp <= self.player.max_hp // 2:
             hp_color = Colors.BRIGHT_YELLOW
         if self.player.current_hp < self.player.max_hp // 2:
             hp_color = Colors.BRIGHT_RED
-        print(f"HP: {hp_color}{self.player.current_hp}{Colors.RESET}/{self.player.max_hp}")
-        print(f"Attack: {self.player.calculate_attack()} (Melee), {self.player.calculate_attack(ranged=True)} (Ranged)")
-        print(f"Armor: {self.player.calculate_armor()}")
-        print(f"Exp: {self.player.exp}/{self.player.exp_needed}")
-        print(f"Position: ({self.player.x}, {self.player.y})")
+        return [
+            f"Player: Level {self.player.level}",
+            f"HP: {hp_color}{self.player.current_hp}{Colors.RESET}/{self.player.max_hp}",
+            f"Attack: {self.player.attack} (Melee), {self.player.ranged_attack} (Ranged)",
+            f"Armor: {self.player.armor}",
+            f"Exp: {self.player.exp}/{self.player.exp_needed}",
+            f"Position: ({self.player.x}, {self.player.y})",
+        ]
     
     def display_gear(self):
-        print("\n--- Equipment ---")
+        print()
+        for line in self.gear_lines():
+            print(line)
+
+    def gear_lines(self):
+        lines = ["--- Equipment ---"]
         for slot, item in self.player.gear.items():
             if item:
                 # Nicely format Gear objects or dict-based starting gear
                 if isinstance(item, Gear):
-                    print(f"{slot}: {item}")
+                    lines.append(f"{slot}: {item}")
                 elif isinstance(item, dict):
                     name = item.get('name', 'Unknown')
                     bonus = item.get('bonus', 0)
                     sockets = item.get('sockets', [])
                     socket_str = f" [{len(sockets)} sockets]" if sockets else ""
-                    print(f"{slot}: {name} +{bonus}{socket_str}")
+                    lines.append(f"{slot}: {name} +{bonus}{socket_str}")
                 else:
-                    print(f"{slot}: {item}")
+                    lines.append(f"{slot}: {item}")
             else:
-                print(f"{slot}: Empty")
+                lines.append(f"{slot}: Empty")
+        return lines
     
-    def combat_roll(self, attacker_attack, defender_armor, dice_roll):
+    @staticmethod
+    def combat_roll(attacker_attack, defender_armor, dice_roll):
         """Calculate combat result based on rules"""
         total_attack = dice_roll + attacker_attack
         
@@ -814,27 +2641,22 @@ class Game:
             return DamageResult.HIT, 1
     
     def player_attack_monster(self, monster, ranged=False):
-        print(f"\nYou attack the {monster.type.value}!")
-        dice_roll = random.randint(1, 6)
-        player_attack = self.player.calculate_attack(ranged)
+        dice_roll = self.combat_dice.roll()
+        player_attack = self.player.ranged_attack if ranged else self.player.attack
 
         result, multiplier = self.combat_roll(player_attack, monster.armor, dice_roll)
 
         damage = player_attack * multiplier
-        if result == DamageResult.CRIT:
-            print(f"{Colors.BRIGHT_RED}CRITICAL HIT!{Colors.RESET} (Rolled {dice_roll} + {player_attack} = {dice_roll + player_attack})")
-        elif result == DamageResult.HIT:
-            print(f"Hit! (Rolled {dice_roll} + {player_attack} = {dice_roll + player_attack} vs Armor {monster.armor})")
-        elif result == DamageResult.HALF:
-            print(f"Glancing blow! (Rolled {dice_roll} + {player_attack} = {dice_roll + player_attack} vs Armor {monster.armor})")
-        else:  # MISS
-            print(f"Miss! (Rolled {dice_roll} + {player_attack} = {dice_roll + player_attack} vs Armor {monster.armor})")
-        
+        monster_killed = monster.take_damage(damage) if damage > 0 else False
+        self.events.emit(AttackResolved, monster.type, True, dice_roll, player_attack,
+                         monster.armor, result, damage)
+
         if damage > 0:
-            monster_killed = monster.take_damage(damage)
-            print(f"You deal {damage} damage to the {monster.type.value}!")
+            coord = self.dungeon.monster_positions[monster]
+            self.dungeon.rehash(self.dungeon.grid[coord])
             if monster_killed:
-                print(f"You defeated the {monster.type.value}!")
+                self.dungeon.remove_monster(monster)
+                self.events.emit(MonsterKilled, monster.type, monster.floor_level)
                 self.player.gain_exp(monster.exp)
                 # Heal after defeating monster
                 self.player.heal(self.player.max_hp - self.player.current_hp)
@@ -844,40 +2666,41 @@ class Game:
             return monster_killed
         return False
     
+    def fight_odds(self, monster, ranged=False, monster_first=False):
+        """Exact odds of fighting this monster to the death from the player's current state"""
+        player = self.player
+        return solve_fight(player.ranged_attack if ranged else player.attack, player.armor,
+                           player.current_hp, monster.attack, monster.armor, monster.hp,
+                           monster_first)
+
     def monster_attack_player(self, monster):
         # Prevent the same monster from attacking multiple times per turn
         if monster in self.monsters_attacked_this_turn:
             return False
 
-        print(f"\nThe {monster.type.value} attacks you!")
-        dice_roll = random.randint(1, 6)
-        player_armor = self.player.calculate_armor()
+        dice_roll = self.combat_dice.roll()
+        player_armor = self.player.armor
 
         result, multiplier = self.combat_roll(monster.attack, player_armor, dice_roll)
 
         damage = monster.attack * multiplier
-        if result == DamageResult.CRIT:
-            print(f"{Colors.BRIGHT_RED}CRITICAL HIT!{Colors.RESET} (Monster rolled {dice_roll} + {monster.attack} = {dice_roll + monster.attack})")
-        elif result == DamageResult.HIT:
-            print(f"Hit! (Monster rolled {dice_roll} + {monster.attack} = {dice_roll + monster.attack} vs your Armor {player_armor})")
-        elif result == DamageResult.HALF:
-            print(f"Glancing blow! (Monster rolled {dice_roll} + {monster.attack} = {dice_roll + monster.attack} vs your Armor {player_armor})")
-        else:  # MISS
-            print(f"Miss! (Monster rolled {dice_roll} + {monster.attack} = {dice_roll + monster.attack} vs your Armor {player_armor})")
-            damage = 0
+        self.events.emit(AttackResolved, monster.type, False, dice_roll, monster.attack,
+                         player_armor, result, damage)
 
         if damage > 0:
             died = self.player.take_damage(damage)
             if died:
                 self.game_over = True
-                print("You have been defeated...")
+                self.events.emit(PlayerDefeated)
 
         # Mark this monster as having attacked this turn
         self.monsters_attacked_this_turn.add(monster)
         return True
     
     def get_loot(self, loot):
-        print(f"\nYou found: {loot}")
+        if isinstance(loot, GearSpawn):
+            loot = loot.build()
+        self.events.emit(LootFound, loot)
 
         if isinstance(loot, Gem):
             # Auto-socket if possible
@@ -885,18 +2708,19 @@ class Game:
             for slot, item in self.player.gear.items():
                 if item and isinstance(item, Gear) and len(item.sockets) < item.max_sockets:
                     item.add_gem(loot)
-                    print(f"Socketed {loot} into {item.type.value}")
+                    self.player.stats_changed()
+                    self.events.emit(GemSocketed, loot, item.type)
                     socketed = True
                     break
 
             if not socketed:
-                print("No available sockets for this gem.")
+                self.events.emit(GemSocketed, loot, None)
 
         elif isinstance(loot, Gear):
             # Let player decide what to do with gear
             slot = self.get_slot_for_gear(loot.type)
             if slot is None:
-                print("You cannot equip this item right now.")
+                self.events.emit(Notice, "You cannot equip this item right now.")
                 return
 
             current_item = self.player.gear[slot]
@@ -911,20 +2735,15 @@ class Game:
             elif slot in ['weapon1'] or (slot == 'weapon2' and loot.type in [GearType.SWORD, GearType.GREATSWORD]):
                 stat = 'attack'
 
-            if stat:
+            if self.headless:
+                # No one to ask, so only take strict upgrades
                 if bonus_change > 0:
-                    print(f"Equip it? +{bonus_change} {stat}")
-                elif bonus_change < 0:
-                    print(f"Equip it? -{abs(bonus_change)} {stat}")
-                else:
-                    print("Equip it? No change")
-            else:
-                print("Equip it?")
+                    self.equip_gear(loot)
+                return
 
-            print("1. Equip it")
-            print("2. Leave it")
+            self.events.emit(EquipOffered, loot, slot, stat, bonus_change)
 
-            choice = input("Choose (1-2): ").strip()
+            choice = self.ask("Choose (1-2): ").strip()
             if choice == "1":
                 self.equip_gear(loot)
     
@@ -952,9 +2771,10 @@ class Game:
         if slot:
             old_item = self.player.gear[slot]
             self.player.gear[slot] = gear
-            print(f"Equipped {gear} in {slot}")
+            self.player.stats_changed()
+            self.events.emit(GearEquipped, gear, slot)
         else:
-            print("Cannot equip this item - no suitable slot")
+            self.events.emit(GearEquipped, gear, None)
     
     def reveal_tile_and_adjacent(self, x, y):
         """Reveal the tile at (x,y) and all adjacent tiles"""
@@ -968,27 +2788,29 @@ class Game:
             self.dungeon.reveal_tile(adj_x, adj_y)
 
     def reveal_vision(self, x, y):
-        """Reveal tiles based on player vision from current position using flood fill and line of sight"""
-        visited = set()
-        queue = [(x, y)]
-        while queue:
-            cx, cy = queue.pop(0)
-            if (cx, cy) in visited:
-                continue
-            visited.add((cx, cy))
-            tile = self.dungeon.grid.get((cx, cy))
-            if tile:
+        """Reveal tiles based on player vision from current position using flood fill and line of sight.
+
+        Revealing never undoes itself, so once done from a position there is
+        nothing left to do until the player moves or the floor gains a tile or
+        door: the call is memoized on (x, y, floor version) and repeats return
+        at once.
+        """
+        dungeon = self.dungeon
+        if dungeon.vision_current(x, y):
+            return
+        # The flood through doors reaches what the door graph reaches; only unrevealed tiles need a visit
+        if dungeon.unrevealed:
+            reach = dungeon.paths.row((x, y))
+            for coord in [coord for coord in dungeon.unrevealed if coord in reach]:
+                tile = dungeon.grid[coord]
                 tile.revealed = True
-                for direction in Direction:
-                    if tile.doors[direction]:
-                        dx, dy = direction.value
-                        nx, ny = cx + dx, cy + dy
-                        if (nx, ny) not in visited:
-                            queue.append((nx, ny))
+                dungeon.rehash(tile)
 
         # Additionally reveal line of sight in all directions up to 3 tiles
         for direction in Direction:
             self.reveal_line_of_sight(direction)
+        # Keyed on the version after any tiles the lines of sight generated
+        dungeon.vision = (x, y, dungeon.version)
 
 
 
@@ -1011,7 +2833,7 @@ class Game:
         current_tile = self.dungeon.grid.get((self.player.x, self.player.y))
         adjacent_monsters = []
         for direction in Direction:
-            if current_tile and current_tile.doors[direction]:  # Only attack through doors
+            if current_tile and current_tile.has_door(direction):  # Only attack through doors
                 dx, dy = direction.value
                 check_x, check_y = self.player.x + dx, self.player.y + dy
                 adj_tile = self.dungeon.grid.get((check_x, check_y))
@@ -1035,13 +2857,15 @@ class Game:
                 # Generate new tile
                 new_tile = self.generate_new_tile(new_x, new_y, direction)
                 if not new_tile:
-                    print("Cannot generate tile in that direction!")
+                    self.events.emit(Notice, "Cannot generate tile in that direction!")
                     return
             else:
                 new_tile = self.dungeon.grid[(new_x, new_y)]
 
             # Reveal the tile before moving to show any monsters
-            new_tile.revealed = True
+            if not new_tile.revealed:
+                new_tile.revealed = True
+                self.dungeon.rehash(new_tile)
 
             # Check if there's a monster blocking the way
             if new_tile.monster and new_tile.monster.alive:
@@ -1061,17 +2885,16 @@ class Game:
 
             # Ensure two-way connection
             opposite_dir = self.dungeon.get_opposite_direction(direction)
-            new_tile.doors[opposite_dir] = True
+            self.dungeon.open_door(new_tile, opposite_dir)
 
             # Generate and reveal connected tiles based on the new tile's shape
             self.generate_and_reveal_connected_tiles(new_x, new_y, new_tile)
 
-            shape_name = new_tile.shape.value if new_tile.shape else "Room"
-            print(f"You move {direction.name} to ({new_x}, {new_y}) - {shape_name}")
+            self.events.emit(PlayerMoved, direction, new_x, new_y, new_tile.shape)
 
             # Check for immediate combat
             if (new_x, new_y) != self.dungeon.player_start and new_tile.monster and new_tile.monster.alive:
-                print(f"You encounter a {new_tile.monster.type.value}!")
+                self.events.emit(MonsterEncountered, new_tile.monster.type, new_x, new_y)
                 # Monster gets first attack
                 self.monster_attack_player(new_tile.monster)
                 return
@@ -1083,66 +2906,52 @@ class Game:
                 # If this was a lair, it becomes stairs after looting
                 if new_tile.type == TileType.LAIR:
                     new_tile.type = TileType.STAIRS
-                    print("The lair has been looted and becomes stairs!")
+                    self.events.emit(LairLooted, new_x, new_y)
+                self.dungeon.rehash(new_tile)
 
             # Reveal vision from new position
             self.reveal_vision(new_x, new_y)
 
         else:
-            print("There's no door in that direction!")
+            self.events.emit(Notice, "There's no door in that direction!")
 
     def find_path(self, start_x, start_y, goal_x, goal_y):
-        """Find shortest path from start to goal using BFS, following dungeon doors"""
-        queue = deque([(start_x, start_y, [(start_x, start_y)])])
-        visited = set()
-        visited.add((start_x, start_y))
-
-        while queue:
-            x, y, path = queue.popleft()
-            if (x, y) == (goal_x, goal_y):
-                return path
-
-            tile = self.dungeon.grid.get((x, y))
-            if not tile:
-                continue
-
-            for direction in Direction:
-                if tile.doors[direction]:
-                    dx, dy = direction.value
-                    nx, ny = x + dx, y + dy
-                    if (nx, ny) not in visited and (nx, ny) in self.dungeon.grid:
-                        visited.add((nx, ny))
-                        new_path = path + [(nx, ny)]
-                        queue.append((nx, ny, new_path))
-        return None
+        """Find shortest path from start to goal following dungeon doors"""
+        return self.dungeon.paths.path((start_x, start_y), (goal_x, goal_y))
 
     def move_monsters_towards_player(self):
-        """Move all monsters 1 tile towards the player, following dungeon paths"""
-        # Collect all monsters to move
-        monsters_to_move = []
-        for tile in self.dungeon.grid.values():
-            if tile.monster and tile.monster.alive:
-                monsters_to_move.append((tile.x, tile.y, tile.monster))
+        """Move every awake monster 1 tile towards the player, following dungeon paths"""
+        # Every monster reads the same distance field instead of searching on its own;
+        # on large floors only those within the activation radius are awake to move
+        field, awake = self.dungeon.active_monsters((self.player.x, self.player.y))
+        monsters_to_move = [(x, y, monster) for (x, y), monster in awake]
 
         # Move each monster
         for mx, my, monster in monsters_to_move:
-            # Find path to player
-            path = self.find_path(mx, my, self.player.x, self.player.y)
-            if path and len(path) > 2:  # Only move if more than 1 tile away (not adjacent)
-                # Next position in path
-                nx, ny = path[1]
-                # Check if valid move: not starting tile, not occupied by player or another monster
-                target_tile = self.dungeon.grid.get((nx, ny))
-                if target_tile and (nx, ny) != self.dungeon.player_start and not target_tile.monster and (nx, ny) != (self.player.x, self.player.y):
-                    # Move monster
-                    old_tile = self.dungeon.grid[(mx, my)]
-                    old_tile.monster = None
-                    target_tile.monster = monster
+            steps = field.get((mx, my))
+            if steps is None or steps <= 1:  # Only move if more than 1 tile away (not adjacent)
+                continue
+            # Next position: first door that leads one step closer, same as the first BFS path
+            old_tile = self.dungeon.grid[(mx, my)]
+            for direction in Direction:
+                if old_tile.has_door(direction):
+                    dx, dy = direction.value
+                    nx, ny = mx + dx, my + dy
+                    if field.get((nx, ny)) == steps - 1:
+                        break
+            else:
+                continue
+            # Check if valid move: not starting tile, not occupied by player or another monster
+            target_tile = self.dungeon.grid.get((nx, ny))
+            if target_tile and (nx, ny) != self.dungeon.player_start and not target_tile.monster and (nx, ny) != (self.player.x, self.player.y):
+                # Move monster
+                self.dungeon.move_monster(old_tile, target_tile)
+                self.events.emit(MonsterMoved, monster.type, mx, my, nx, ny)
     
     def generate_and_reveal_connected_tiles(self, x, y, tile):
         """Generate and reveal tiles connected to this tile based on its doors"""
         for direction in Direction:
-            if direction != tile.entrance_direction and tile.doors[direction]:
+            if direction != tile.entrance_direction and tile.has_door(direction):
                 self.generate_connected_tile_in_direction(x, y, direction)
     
     def generate_connected_tile_in_direction(self, x, y, direction):
@@ -1151,7 +2960,7 @@ class Game:
         new_x, new_y = x + dx, y + dy
         
         # Check if we're within bounds
-        if abs(new_x) > 4 or abs(new_y) > 4:
+        if abs(new_x) > self.radius or abs(new_y) > self.radius:
             return None
             
         # Check if tile already exists
@@ -1162,6 +2971,7 @@ class Game:
         new_tile = self.generate_new_tile(new_x, new_y, direction)
         if new_tile:
             new_tile.revealed = True
+            self.dungeon.rehash(new_tile)
             return new_tile
         return None
     
@@ -1189,11 +2999,13 @@ class Game:
         """Generate a new tile only when moving through a door to unexplored area"""
         # Check distance from start
         distance = abs(x) + abs(y)
-        if distance > 4:
+        if distance > self.radius:
             return None
-            
+        if self.dungeon.hashed:
+            return self.dungeon.generate_tile(x, y)
+
         # Determine if this should be boundary tile
-        if distance == 4:
+        if distance == self.radius:
             if not self.dungeon.lair_location:
                 self.dungeon.lair_location = (x, y)
                 tile_type = TileType.LAIR
@@ -1215,11 +3027,11 @@ class Game:
 
         # Create the tile with proper shape
         new_tile = Tile(x, y, tile_type, shape)
-        self.dungeon.grid[(x, y)] = new_tile
 
         # Configure doors based on shape and entrance direction
         entrance_direction = self.dungeon.get_opposite_direction(direction)
         new_tile.configure_doors_from_shape(entrance_direction)
+        new_tile = self.dungeon.add_tile(new_tile)
 
         # Populate if needed
         if tile_type == TileType.LAIR:
@@ -1242,13 +3054,27 @@ class Game:
         print("? = Unexplored")
         print("█ = Wall")
     
-    def handle_attack(self):
+    def ask(self, prompt):
+        """Read a line of input from the player"""
+        if self.renderer:
+            return self.renderer.ask(self, prompt)
+        return input(prompt)
+
+    def choose_target(self, prompt, target=None):
+        """Return a 0-based target index: the one given, the first in headless mode, or the player's pick"""
+        if target is not None:
+            return target
+        if self.headless:
+            return 0
+        return int(self.ask(prompt)) - 1
+
+    def handle_attack(self, target=None):
         current_tile = self.dungeon.grid.get((self.player.x, self.player.y))
 
         # Check for adjacent monsters
         adjacent_monsters = []
         for direction in Direction:
-            if current_tile and current_tile.doors[direction]:  # Only attack through doors
+            if current_tile and current_tile.has_door(direction):  # Only attack through doors
                 dx, dy = direction.value
                 check_x, check_y = self.player.x + dx, self.player.y + dy
                 adj_tile = self.dungeon.grid.get((check_x, check_y))
@@ -1256,12 +3082,10 @@ class Game:
                     adjacent_monsters.append((adj_tile.monster, direction))
         
         if adjacent_monsters:
-            print("\nAdjacent monsters:")
-            for i, (monster, direction) in enumerate(adjacent_monsters, 1):
-                print(f"{i}. {monster.type.value} to the {direction.name}")
+            self.events.emit(TargetsListed, [(monster, direction, None) for monster, direction in adjacent_monsters], False)
             
             try:
-                choice = int(input("Choose monster to attack (number): ")) - 1
+                choice = self.choose_target("Choose monster to attack (number): ", target)
                 if 0 <= choice < len(adjacent_monsters):
                     monster, _ = adjacent_monsters[choice]
                     self.player_attack_monster(monster)
@@ -1270,11 +3094,11 @@ class Game:
                     if monster.alive:
                         self.monster_attack_player(monster)
                 else:
-                    print("Invalid choice!")
+                    self.events.emit(Notice, "Invalid choice!")
             except ValueError:
-                print("Please enter a number!")
+                self.events.emit(Notice, "Please enter a number!")
         else:
-            print("No monsters in adjacent tiles to attack!")
+            self.events.emit(Notice, "No monsters in adjacent tiles to attack!")
     
     def reveal_line_of_sight(self, direction, max_distance=9):
         """Reveal tiles in a straight line in the given direction up to max_distance, stopping at walls"""
@@ -1286,22 +3110,26 @@ class Game:
             prev_tile = self.dungeon.grid.get((prev_x, prev_y))
 
             # If the previous tile doesn't have a door in this direction, line of sight is blocked
-            if prev_tile and not prev_tile.doors[direction]:
+            if prev_tile and not prev_tile.has_door(direction):
                 break
 
             check_x = self.player.x + dx * distance
             check_y = self.player.y + dy * distance
 
             # Check bounds
-            if abs(check_x) > 4 or abs(check_y) > 4:
+            if abs(check_x) > self.radius or abs(check_y) > self.radius:
                 break
 
             # Reveal this tile (generate if doesn't exist)
             tile = self.dungeon.grid.get((check_x, check_y))
-            if tile is None:
+            if tile is None and self.dungeon.hashed:
+                tile = self.dungeon.generate_tile(check_x, check_y)
+                if tile is None:
+                    break
+            elif tile is None:
                 # Generate new tile for line of sight
                 boundary_distance = max(abs(check_x), abs(check_y))
-                if boundary_distance == 4:
+                if boundary_distance == self.radius:
                     # Boundary tiles are either LAIR (first one) or STAIRS
                     if self.dungeon.lair_location is None:
                         tile_type = TileType.LAIR
@@ -1315,20 +3143,23 @@ class Game:
                 tile = Tile(check_x, check_y, tile_type, shape)
                 entrance_direction = self.dungeon.get_opposite_direction(direction)
                 tile.configure_doors_from_shape(entrance_direction)
-                self.dungeon.grid[(check_x, check_y)] = tile
+                tile = self.dungeon.add_tile(tile)
                 # Populate the new tile
                 if tile_type == TileType.LAIR:
                     self.dungeon.populate_lair(tile)
                 elif tile_type == TileType.EMPTY:
                     self.dungeon.populate_tile(tile)
                 # STAIRS tiles are not populated
-            tile.revealed = True
+            if not tile.revealed:
+                tile.revealed = True
+                self.dungeon.rehash(tile)
 
-    def handle_ranged_attack(self):
+    def handle_ranged_attack(self, target=None):
         """Handle ranged attacks in straight lines up to 3 tiles away"""
-        # First, reveal line of sight in all directions
-        for direction in Direction:
-            self.reveal_line_of_sight(direction)
+        # First, reveal line of sight in all directions, unless vision from here is still current
+        if not self.dungeon.vision_current(self.player.x, self.player.y):
+            for direction in Direction:
+                self.reveal_line_of_sight(direction)
 
         # Find all monsters in straight lines within range
         ranged_targets = []
@@ -1350,49 +3181,89 @@ class Game:
                     break  # Stop if tile doesn't exist or isn't revealed
 
         if ranged_targets:
-            print("\nRanged attack targets:")
-            for i, (monster, direction, distance) in enumerate(ranged_targets, 1):
-                print(f"{i}. {monster.type.value} {distance} tiles to the {direction.name}")
+            self.events.emit(TargetsListed, ranged_targets, True)
 
             try:
-                choice = int(input("Choose target to attack (number): ")) - 1
+                choice = self.choose_target("Choose target to attack (number): ", target)
                 if 0 <= choice < len(ranged_targets):
                     monster, _, _ = ranged_targets[choice]
                     self.player_attack_monster(monster, ranged=True)
 
                     # Monster counter-attacks if still alive and adjacent
                     if monster.alive:
-                        # Check if monster is adjacent (distance 1)
-                        monster_tile = None
-                        for (x, y), tile in self.dungeon.grid.items():
-                            if tile.monster == monster:
-                                monster_tile = tile
-                                break
-
-                        if monster_tile:
-                            dx = abs(monster_tile.x - self.player.x)
-                            dy = abs(monster_tile.y - self.player.y)
-                            if dx + dy == 1:  # Adjacent
-                                self.monster_attack_player(monster)
+                        x, y = self.dungeon.monster_positions[monster]
+                        if abs(x - self.player.x) + abs(y - self.player.y) == 1:  # Adjacent
+                            self.monster_attack_player(monster)
                 else:
-                    print("Invalid choice!")
+                    self.events.emit(Notice, "Invalid choice!")
             except ValueError:
-                print("Please enter a number!")
+                self.events.emit(Notice, "Please enter a number!")
         else:
-            print("No monsters in range for ranged attack!")
+            self.events.emit(Notice, "No monsters in range for ranged attack!")
     
     def use_stairs(self):
         if self.dungeon.grid.get((self.player.x, self.player.y)).type == TileType.STAIRS:
-            print("\nYou descend to the next floor...")
+            self.events.emit(FloorDescended, self.current_floor + 1)
             self.current_floor += 1
-            self.dungeon = Dungeon(self.current_floor)
+            self.dungeon = Dungeon(self.current_floor, self.compact, self.events, self.streams, self.radius, self.hashed)
             self.player.floor_level = self.current_floor
             # Reset player position to start of new floor
             self.player.x, self.player.y = self.dungeon.player_start
             self.just_used_stairs = True
         else:
-            print("There are no stairs here!")
+            self.events.emit(Notice, "There are no stairs here!")
     
+    def step(self, action, target=None):
+        """Resolve one player action plus the monster turn that follows it.
+
+        `action` is an Action or its key ("W", "R", ...); `target` picks a ranged
+        target by index instead of prompting. Returns a StepResult.
+        """
+        if isinstance(action, str):
+            try:
+                action = Action(action.upper())
+            except ValueError:
+                action = None
+
+        # Clear monsters attacked this turn at start of each player turn
+        self.monsters_attacked_this_turn = set()
+
+        if action in MOVE_ACTIONS:
+            self.handle_move(MOVE_ACTIONS[action])
+        elif action == Action.RANGED:
+            self.handle_ranged_attack(target)
+        elif action == Action.STAIRS:
+            self.use_stairs()
+        elif action == Action.QUIT:
+            self.events.emit(Notice, "Thanks for playing!")
+            self.game_over = True
+            return StepResult(self, action)
+        else:
+            self.events.emit(Notice, "Invalid action! Use WASD for movement, T/R/F for actions, Q to quit.")
+
+        # Update vision after player action (printing the map does this itself)
+        if not self.game_over:
+            if self.headless or self.renderer:
+                self.reveal_vision(self.player.x, self.player.y)
+            else:
+                self.display_map()
+
+        # Handle monster movement and attacks after player action
+        if not self.game_over:
+            if self.just_used_stairs:
+                self.just_used_stairs = False
+            else:
+                self.handle_adjacent_monster_attacks()  # Attack adjacent monsters first
+                self.move_monsters_towards_player()  # Then move non-adjacent monsters
+
+        # Check for game over
+        if self.player.current_hp <= 0:
+            self.game_over = True
+            self.events.emit(GameOver, self.current_floor, self.player.max_floor_mapped)
+
+        self.turn += 1
+        return StepResult(self, action)
+
     def game_loop(self):
         print("=== One Dice Dungeon Delve ===")
         print("Your village needs a hero! Map the dungeon and slay the Red Dragon!")
@@ -1400,58 +3271,941 @@ class Game:
         self.display_map()  # Show initial map
 
         while not self.game_over and not self.victory:
-            # Clear monsters attacked this turn at start of each player turn
-            self.monsters_attacked_this_turn = set()
-
             self.display_player_status()
             self.display_gear()
 
             print("\nActions: WASD to move, R for ranged attack, F for stairs, Q to quit")
 
-            choice = self.get_single_key()
-
-            if choice in ['W', 'A', 'S', 'D']:
-                direction_map = {'W': Direction.UP, 'A': Direction.LEFT,
-                               'S': Direction.DOWN, 'D': Direction.RIGHT}
-                self.handle_move(direction_map[choice])
-
-
+            self.step(self.get_single_key())
 
-            elif choice == "R":
-                self.handle_ranged_attack()
+        if self.victory:
+            print("\n*** VICTORY! ***")
+            print("You have slain the Red Dragon and saved your village!")
 
-            elif choice == "F":
-                self.use_stairs()
+    def fullscreen_loop(self, renderer=None):
+        """Play on the alternate screen, redrawing only what changed each turn"""
+        self.renderer = renderer or ScreenRenderer()
+        self.text_sink.write = self.renderer.add_message
+        self.events.emit(Notice, "=== One Dice Dungeon Delve ===")
+        self.events.emit(Notice, "Your village needs a hero! Map the dungeon and slay the Red Dragon!")
+        try:
+            with self.renderer:
+                self.reveal_vision(self.player.x, self.player.y)
+                while not self.game_over and not self.victory:
+                    self.renderer.draw(self, "Actions: WASD to move, R for ranged attack, F for stairs, Q to quit")
+                    self.step(self.get_single_key())
+        finally:
+            self.text_sink.write = print
+            renderer, self.renderer = self.renderer, None
+
+        # Leave the last messages on the normal screen
+        for line in renderer.messages:
+            print(line)
+        if self.victory:
+            print("\n*** VICTORY! ***")
+            print("You have slain the Red Dragon and saved your village!")
 
-            elif choice == "Q":
-                print("Thanks for playing!")
-                break
+# --- Balance simulation ---
+class FightOdds:
+    """Exact outcome distribution of a fight between the player and one monster"""
+    __slots__ = ('win', 'loss', 'stalemate', 'expected_rounds', 'rounds', 'hp_remaining')
+
+    def __init__(self, win, loss, stalemate, expected_rounds, rounds, hp_remaining):
+        self.win = win
+        self.loss = loss
+        # Probability the fight never ends because neither side can deal damage
+        self.stalemate = stalemate
+        # Mean rounds until the fight ends (infinite if it can stall forever)
+        self.expected_rounds = expected_rounds
+        # Round -> probability the fight ends in it, up to a 1e-12 tail
+        self.rounds = rounds
+        # Player HP left -> probability, over the fights the player wins
+        self.hp_remaining = hp_remaining
+
+    def __repr__(self):
+        return (f"FightOdds(win={self.win:.4f}, loss={self.loss:.4f}, "
+                f"expected_rounds={self.expected_rounds:.2f})")
+
+    def copy(self):
+        return FightOdds(self.win, self.loss, self.stalemate, self.expected_rounds,
+                         dict(self.rounds), dict(self.hp_remaining))
+
+def attack_odds(attack, armor):
+    """Chance of each damage amount, in half HP, from a single attack roll"""
+    odds = Counter()
+    for dice_roll in range(1, 7):
+        _, multiplier = Game.combat_roll(attack, armor, dice_roll)
+        odds[int(attack * multiplier * 2)] += 1 / 6
+    return odds
+
+def solve_fight(player_attack, player_armor, player_hp, monster_attack, monster_armor, monster_hp,
+                monster_first=False):
+    """Exact FightOdds for one matchup (see markov_fight).
+
+    Results are cached per matchup; each call returns its own copy, so
+    changing one never changes what later callers get.
+    """
+    return markov_fight(player_attack, player_armor, player_hp, monster_attack, monster_armor,
+                        monster_hp, monster_first).copy()
+
+@lru_cache(maxsize=4096)
+def markov_fight(player_attack, player_armor, player_hp, monster_attack, monster_armor, monster_hp,
+                 monster_first=False):
+    """Solve a fight as a Markov chain over (player HP, monster HP).
+
+    Each round the player attacks and, if the monster survives, the monster
+    strikes back. With monster_first the monster gets one extra attack before
+    the first round, as when it strikes from a neighbouring tile
+    (Game.handle_adjacent_monster_attacks) before the player attacks it;
+    walking into a monster's tile, the player strikes first. HP is tracked
+    in half points so glancing blows stay exact, and rounds where nobody
+    deals damage are folded out analytically instead of being iterated.
+    """
+    player_hits = sorted(attack_odds(player_attack, monster_armor).items())
+    monster_hits = sorted(attack_odds(monster_attack, player_armor).items())
+    start_p = round(player_hp * 2)
+    start_m = round(monster_hp * 2)
+
+    # Starting distribution over states, after the monster's opening attack if it has one
+    states = Counter()
+    opening_loss = 0.0
+    if monster_first:
+        for taken, m_odds in monster_hits:
+            if taken >= start_p:
+                opening_loss += m_odds
             else:
-                print("Invalid action! Use WASD for movement, T/R/F for actions, Q to quit.")
-
-            # Display updated map after player action
-            if not self.game_over:
-                self.display_map()
-
-            # Handle monster movement and attacks after player action
-            if not self.game_over:
-                if self.just_used_stairs:
-                    self.just_used_stairs = False
+                states[(start_p - taken, start_m)] += m_odds
+    else:
+        states[(start_p, start_m)] = 1.0
+
+    # Push the probability of reaching each state forward through the fight. A round
+    # only ever lowers HP, so taking states from the highest (player HP, monster HP)
+    # down means every state has all its probability in before it is passed on
+    reach = Counter(states)
+    queue = [(-p, -m) for p, m in states]
+    heapq.heapify(queue)
+    win, loss, stalemate, expected_rounds = 0.0, opening_loss, 0.0, 0.0
+    hp = Counter()
+    while queue:
+        neg_p, neg_m = heapq.heappop(queue)
+        p, m = -neg_p, -neg_m
+        odds_here = reach.pop((p, m))
+        state_win = state_loss = stay = 0.0
+        moves = []
+        for dealt, p_odds in player_hits:
+            if dealt >= m:
+                state_win += p_odds
+                continue
+            for taken, m_odds in monster_hits:
+                odds = p_odds * m_odds
+                if taken >= p:
+                    state_loss += odds
+                elif dealt == 0 and taken == 0:
+                    stay += odds
                 else:
-                    self.handle_adjacent_monster_attacks()  # Attack adjacent monsters first
-                    self.move_monsters_towards_player()  # Then move non-adjacent monsters
-
-            # Check for game over
-            if self.player.current_hp <= 0:
-                self.game_over = True
-                print(f"\nGame Over! You reached floor {self.current_floor}")
-                print(f"Max floor mapped: {self.player.max_floor_mapped}")
+                    moves.append((odds, (p - taken, m - dealt)))
+        if not moves and not state_win and not state_loss:
+            # Neither side can ever deal damage
+            stalemate += odds_here
+            expected_rounds = float('inf')
+            continue
+        # Rounds spent on the self-loop only delay the same set of outcomes
+        odds_here /= 1 - stay
+        expected_rounds += odds_here
+        win += odds_here * state_win
+        loss += odds_here * state_loss
+        if state_win:
+            hp[p / 2] += odds_here * state_win
+        for odds, state in moves:
+            if state not in reach:
+                heapq.heappush(queue, (-state[0], -state[1]))
+            reach[state] += odds_here * odds
+
+    # The round-by-round distribution has an infinite tail, so push the mass forward until it is negligible.
+    # Neither side's damage depends on the other's HP, so a fight lasts past round t exactly
+    # when both sides' HP, tracked apart, would still be up after it
+    # Round 0 is the monster's opening attack
+    rounds = {0: opening_loss} if opening_loss else {}
+    player_left = Counter()
+    for (p, m), odds in states.items():
+        player_left[p] += odds
+    monster_left = {start_m: 1.0}
+    remaining = sum(player_left.values())
+    turn = 0
+    while remaining - stalemate > 1e-12 and turn < 10000:
+        turn += 1
+        slain = monster_killed = 0.0
+        next_monster = Counter()
+        for m, odds in monster_left.items():
+            for dealt, p_odds in player_hits:
+                if dealt >= m:
+                    monster_killed += odds * p_odds
+                else:
+                    next_monster[m - dealt] += odds * p_odds
+        next_player = Counter()
+        for p, odds in player_left.items():
+            for taken, m_odds in monster_hits:
+                if taken >= p:
+                    slain += odds * m_odds
+                else:
+                    next_player[p - taken] += odds * m_odds
+        ended = monster_killed * sum(player_left.values()) + sum(next_monster.values()) * slain
+        if ended:
+            rounds[turn] = ended
+        player_left, monster_left = next_player, next_monster
+        remaining -= ended
+
+    return FightOdds(win, loss, stalemate, expected_rounds, rounds, dict(sorted(hp.items())))
+
+def random_policy(game, rng):
+    """Press any action key at random"""
+    return rng.choice(SIMULATION_ACTIONS)
+
+def wander_policy(game, rng):
+    """Take stairs when standing on them, otherwise walk through a random open door"""
+    tile = game.dungeon.grid.get((game.player.x, game.player.y))
+    if tile.type == TileType.STAIRS:
+        return Action.STAIRS
+    open_doors = [action for action, direction in MOVE_ACTIONS.items() if tile.has_door(direction)]
+    return rng.choice(open_doors) if open_doors else Action.RANGED
+
+ACTION_FOR_DIRECTION = {direction: action for action, direction in MOVE_ACTIONS.items()}
+
+def door_search(dungeon, start):
+    """Yield (steps, coord, first step) for every tile start can walk to, nearest first.
+
+    The first step is the Direction to move in from start (None for start
+    itself), taking the first door in Direction order on ties as
+    DoorGraph.path does. Searching only goes as far as the caller reads, so
+    policies that stop at the nearest thing they want never walk the whole
+    floor.
+    """
+    paths = dungeon.paths
+    node = paths.index.get(start)
+    if node is None:
+        return
+    exits, coords = paths.exits, paths.coords
+    seen = {node}
+    queue = deque([(node, 0, None)])
+    while queue:
+        node, steps, first = queue.popleft()
+        yield steps, coords[node], first
+        for slot, direction in enumerate(DIRECTIONS):
+            next_node = exits[4 * node + slot]
+            if next_node >= 0 and next_node not in seen:
+                seen.add(next_node)
+                queue.append((next_node, steps + 1, direction if first is None else first))
+
+def step_towards(game, goal):
+    """Move action for the first step of the door path to `goal`, or None if there is none"""
+    for steps, coord, first in door_search(game.dungeon, (game.player.x, game.player.y)):
+        if coord == goal:
+            return None if first is None else ACTION_FOR_DIRECTION[first]
+    return None
+
+def explore_action(game, cost=None):
+    """Head for the cheapest frontier door, by path length unless `cost(steps, target)` says otherwise.
+
+    `cost` must never be less than `steps`, so the search can stop once no
+    further tile could beat the best door found.
+    """
+    frontier = game.dungeon.frontier
+    if not frontier:
+        return None
+    best = None
+    for steps, coord, first in door_search(game.dungeon, (game.player.x, game.player.y)):
+        if best is not None and steps >= best[0]:
+            break
+        mask = frontier.get(coord)
+        if not mask:
+            continue
+        for direction in DIRECTIONS:
+            if mask & DOOR_BITS[direction]:
+                dx, dy = direction.value
+                score = cost(steps, (coord[0] + dx, coord[1] + dy)) if cost else steps
+                if best is None or score < best[0]:
+                    best = (score, direction if first is None else first)
+    return None if best is None else ACTION_FOR_DIRECTION[best[1]]
+
+def dive_policy(game, rng):
+    """Stair-diver: take the nearest known stairs, exploring only until some turn up"""
+    player = game.player
+    dungeon = game.dungeon
+    for steps, coord, first in door_search(dungeon, (player.x, player.y)):
+        tile = dungeon.grid[coord]
+        if tile.revealed and tile.type == TileType.STAIRS:
+            return Action.STAIRS if first is None else ACTION_FOR_DIRECTION[first]
+    return explore_action(game) or Action.RANGED
+
+def explore_policy(game, rng):
+    """Greedy explorer: map the whole floor door by door, then dive"""
+    return explore_action(game) or dive_policy(game, rng)
+
+def lair_policy(game, rng):
+    """Lair hunter: search the floor's edge for the lair, loot it, then dive"""
+    lair = game.dungeon.lair_location
+    if lair is None:
+        # The lair is always radius steps from the start, so favor doors leading out that far
+        edge = game.radius
+        action = explore_action(game, lambda steps, target: steps + 2 * (edge - abs(target[0]) - abs(target[1])))
+        if action:
+            return action
+    elif game.dungeon.grid[lair].type == TileType.LAIR:
+        action = step_towards(game, lair)
+        if action:
+            return action
+    return dive_policy(game, rng)
+
+SIMULATION_ACTIONS = [Action.UP, Action.LEFT, Action.DOWN, Action.RIGHT, Action.RANGED, Action.STAIRS]
+
+class TranspositionTable:
+    """Bounded map from state hash to search value that evicts the least recently used entry"""
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+class SearchBot:
+    """Sampled expectimax player, the "strong player" baseline for balance runs.
+
+    Each candidate action is scored by playing it in `samples` forks of the
+    game, each reseeded so the dice (combat, and the layout of tiles not yet
+    generated) come out differently, and averaging the best value found from
+    each result `depth` moves deep. The bot never looks at the game's own
+    future rolls. Values are cached in a transposition table keyed by
+    (Game.state_hash(), depth). Called like the other POLICIES.
+    """
+    def __init__(self, depth=2, samples=2, table_size=1 << 16):
+        self.depth = depth
+        self.samples = samples
+        self.table = TranspositionTable(table_size)
+
+    def __call__(self, game, rng):
+        actions = self.actions(game)
+        values = [self.action_value(game, action, self.depth, rng) for action in actions]
+        return actions[values.index(max(values))]
+
+    def actions(self, game):
+        """Moves through open doors, stairs when standing on them, and R (shoot or wait)"""
+        tile = game.dungeon.grid.get((game.player.x, game.player.y))
+        actions = [action for action, direction in MOVE_ACTIONS.items() if tile.has_door(direction)]
+        if tile.type == TileType.STAIRS:
+            actions.append(Action.STAIRS)
+        actions.append(Action.RANGED)
+        return actions
+
+    def action_value(self, game, action, depth, rng):
+        total = 0
+        for _ in range(self.samples):
+            branch = game.fork(seed=rng.getrandbits(64))
+            branch.step(action)
+            total += self.value(branch, depth - 1, rng)
+        return total / self.samples
+
+    def value(self, game, depth, rng):
+        if depth == 0 or game.game_over:
+            return self.evaluate(game)
+        key = (game.state_hash(), depth)
+        value = self.table.get(key)
+        if value is None:
+            value = max(self.action_value(game, action, depth, rng) for action in self.actions(game))
+            self.table.put(key, value)
+        return value
+
+    def evaluate(self, game):
+        """Heuristic worth of a position: depth reached first, then character strength and exploration"""
+        player = game.player
+        if player.current_hp <= 0:
+            return -1000.0
+        value = (100 * game.current_floor + 10 * player.level + player.exp
+                 + 2 * player.current_hp + 3 * (player.attack + player.armor) + len(game.dungeon.grid))
+        # Known stairs pull the bot towards them
+        field = game.dungeon.distance_field((player.x, player.y))
+        stairs = [steps for coord, steps in field.items()
+                  if game.dungeon.grid[coord].type == TileType.STAIRS]
+        if stairs:
+            value += 20 - 2 * min(stairs)
+        return value
+
+# Policy functions, or classes that make a fresh policy for each game (SearchBot's
+# transposition table must not carry over, or a game would play differently
+# depending on which games ran before it in the same process)
+POLICIES = {
+    'random': random_policy,
+    'wander': wander_policy,
+    'explore': explore_policy,
+    'dive': dive_policy,
+    'lair': lair_policy,
+    'search': SearchBot,
+}
+
+def run_game(seed, policy='wander', max_turns=1000, radius=FLOOR_RADIUS, hashed=False):
+    """Play one seeded headless game to the end and return its summary record"""
+    choose_action = POLICIES[policy]
+    if isinstance(choose_action, type):
+        choose_action = choose_action()
+    game = Game(headless=True, seed=seed, radius=radius, hashed=hashed)
+    policy_rng = game.streams.stream('policy')
+    while not game.game_over and game.turn < max_turns:
+        game.step(choose_action(game, policy_rng))
+    return {
+        'seed': seed,
+        'died': game.player.current_hp <= 0,
+        'floor': game.current_floor,
+        'turns': game.turn,
+        'level': game.player.level,
+    }
+
+class SimulationStats:
+    """Mergeable aggregate of many game records"""
+    def __init__(self):
+        self.games = 0
+        self.deaths = 0
+        self.turns = 0
+        self.death_turns = 0
+        self.reached_floor = Counter()   # floor -> games that got at least this deep
+        self.deaths_by_floor = Counter()  # floor -> games that died there
+        self.level_at_death = Counter()
+
+    def add(self, record):
+        self.games += 1
+        self.turns += record['turns']
+        for floor in range(1, record['floor'] + 1):
+            self.reached_floor[floor] += 1
+        if record['died']:
+            self.deaths += 1
+            self.death_turns += record['turns']
+            self.deaths_by_floor[record['floor']] += 1
+            self.level_at_death[record['level']] += 1
+
+    def merge(self, other):
+        self.games += other.games
+        self.deaths += other.deaths
+        self.turns += other.turns
+        self.death_turns += other.death_turns
+        self.reached_floor.update(other.reached_floor)
+        self.deaths_by_floor.update(other.deaths_by_floor)
+        self.level_at_death.update(other.level_at_death)
+
+    def to_dict(self):
+        return {
+            'games': self.games,
+            'deaths': self.deaths,
+            'turns': self.turns,
+            'death_turns': self.death_turns,
+            'reached_floor': dict(self.reached_floor),
+            'deaths_by_floor': dict(self.deaths_by_floor),
+            'level_at_death': dict(self.level_at_death),
+        }
 
-        if self.victory:
-            print("\n*** VICTORY! ***")
-            print("You have slain the Red Dragon and saved your village!")
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.games = data['games']
+        stats.deaths = data['deaths']
+        stats.turns = data['turns']
+        stats.death_turns = data['death_turns']
+        # JSON turns the integer keys into strings
+        stats.reached_floor = Counter({int(k): v for k, v in data['reached_floor'].items()})
+        stats.deaths_by_floor = Counter({int(k): v for k, v in data['deaths_by_floor'].items()})
+        stats.level_at_death = Counter({int(k): v for k, v in data['level_at_death'].items()})
+        return stats
+
+    def report(self):
+        lines = [f"Games: {self.games}  Deaths: {self.deaths}"]
+        if self.games:
+            lines.append(f"Mean turns survived: {self.turns / self.games:.1f}")
+        if self.deaths:
+            lines.append(f"Mean turns at death: {self.death_turns / self.deaths:.1f}")
+        lines.append("Floor  Reached  Deaths  Death rate")
+        for floor in sorted(self.reached_floor):
+            reached = self.reached_floor[floor]
+            deaths = self.deaths_by_floor[floor]
+            lines.append(f"{floor:>5}  {reached:>7}  {deaths:>6}  {deaths / reached:>10.3f}")
+        lines.append("Level at death: " + ", ".join(
+            f"L{level}: {count}" for level, count in sorted(self.level_at_death.items())))
+        return "\n".join(lines)
+
+def run_chunk(first_seed, count, policy, max_turns, radius=FLOOR_RADIUS, hashed=False):
+    """Worker entry point: play `count` consecutive seeds and return their merged stats"""
+    stats = SimulationStats()
+    for seed in range(first_seed, first_seed + count):
+        stats.add(run_game(seed, policy, max_turns, radius, hashed))
+    return stats.to_dict()
+
+class CheckpointMismatch(ValueError):
+    """A simulate checkpoint saved by a sweep with different settings"""
+    def __init__(self, checkpoint, saved, config):
+        self.checkpoint = checkpoint
+        self.saved = saved
+        self.config = config
+        differences = "; ".join(f"{key}: {saved.get(key)!r} there, {config.get(key)!r} now"
+                                for key in sorted(set(saved) | set(config))
+                                if saved.get(key) != config.get(key))
+        super().__init__(f"checkpoint {checkpoint} was written for a different sweep ({differences}). "
+                         f"Rerun with its settings to resume it, or remove it or pass another "
+                         f"--checkpoint to start fresh")
+
+def simulate(games, workers=1, policy='wander', seed=0, max_turns=1000,
+             chunk_size=1000, checkpoint=None, radius=FLOOR_RADIUS, hashed=False):
+    """Play `games` seeded games across a process pool and merge their stats.
+
+    With a checkpoint path, finished chunks are recorded after each merge so an
+    interrupted sweep picks up where it left off when run again.
+    """
+    config = {'games': games, 'policy': policy, 'seed': seed,
+              'max_turns': max_turns, 'chunk_size': chunk_size, 'radius': radius,
+              'hashed': hashed}
+    stats = SimulationStats()
+    done_chunks = set()
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            saved = json.load(f)
+        if saved['config'] != config:
+            raise CheckpointMismatch(checkpoint, saved['config'], config)
+        stats = SimulationStats.from_dict(saved['stats'])
+        done_chunks = set(saved['done_chunks'])
+
+    def save():
+        if not checkpoint:
+            return
+        tmp_path = checkpoint + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'config': config, 'done_chunks': sorted(done_chunks), 'stats': stats.to_dict()}, f)
+        os.replace(tmp_path, checkpoint)
+
+    pending = {}
+    for index in range(0, (games + chunk_size - 1) // chunk_size):
+        if index not in done_chunks:
+            first = index * chunk_size
+            pending[index] = (seed + first, min(chunk_size, games - first), policy, max_turns, radius, hashed)
+
+    if workers <= 1:
+        for index, args in pending.items():
+            stats.merge(SimulationStats.from_dict(run_chunk(*args)))
+            done_chunks.add(index)
+            save()
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_chunk, *args): index for index, args in pending.items()}
+            for future in as_completed(futures):
+                stats.merge(SimulationStats.from_dict(future.result()))
+                done_chunks.add(futures[future])
+                save()
+    return stats
+
+# --- Agent environments ---
+# Actions an agent picks from, by index; quitting is left out
+ENV_ACTIONS = SIMULATION_ACTIONS
+# Grid channels cover a default floor, 81 cells of a 9x9 grid in CompactGrid order
+OBS_CELLS = (2 * FLOOR_RADIUS + 1) ** 2
+MONSTER_TYPES = list(MonsterType)
+GEAR_TYPES = list(GearType)
+GEM_COLORS = list(GemColor)
+# Loot codes: 0 for none, then one per gem color, then one per gear type
+GEM_CODE = {color: 1 + i for i, color in enumerate(GEM_COLORS)}
+GEAR_CODE = {gear_type: 1 + len(GEM_COLORS) + i for i, gear_type in enumerate(GEAR_TYPES)}
+# Observation: these 9x9 channels (all zero on tiles not yet revealed), then the player stats.
+# Glancing blows deal half damage, so monster_hp, hp and max_hp are in half points (2 per HP)
+OBS_CHANNELS = ['revealed', 'doors', 'tile_type', 'monster', 'monster_hp', 'loot', 'player']
+OBS_STATS = ['hp', 'max_hp', 'level', 'exp', 'exp_needed', 'attack', 'ranged_attack', 'armor',
+             'floor', 'turn']
+OBS_SIZE = len(OBS_CHANNELS) * OBS_CELLS + len(OBS_STATS)
+OBS_DTYPE = 'int16'
+(REVEALED_ROW, DOORS_ROW, TYPE_ROW, MONSTER_ROW, MONSTER_HP_ROW, LOOT_ROW,
+ PLAYER_ROW) = range(len(OBS_CHANNELS))
+
+class DungeonEnv:
+    """One headless game behind a Gym-style reset()/step() interface.
+
+    Observations are written in place into `obs`, a 1-D array of OBS_SIZE
+    (a fresh one unless a view into a bigger buffer is passed). The game
+    keeps its floors in CompactGrids, so the grid channels are filled from
+    NumPy views of the grid's own arrays; only monsters and loot are looked
+    up one by one. Reward is +1 for each floor descended and -1 for dying.
+    Episode k of an env starts from seed + k * seed_stride.
+    """
+    def __init__(self, seed=0, max_turns=1000, obs=None, seed_stride=1):
+        if np is None:
+            raise RuntimeError("DungeonEnv needs NumPy")
+        self.obs = obs if obs is not None else np.zeros(OBS_SIZE, OBS_DTYPE)
+        self.channels = self.obs[:len(OBS_CHANNELS) * OBS_CELLS].reshape(len(OBS_CHANNELS), OBS_CELLS)
+        self.stats = self.obs[len(OBS_CHANNELS) * OBS_CELLS:]
+        self.next_seed = seed
+        self.seed_stride = seed_stride
+        self.max_turns = max_turns
+        self.game = None
+        self.dungeon = None
+
+    def reset(self, seed=None):
+        """Start a new game and return (obs, StepResult)"""
+        if seed is not None:
+            self.next_seed = seed
+        self.game = Game(headless=True, compact=True, seed=self.next_seed)
+        self.next_seed += self.seed_stride
+        self.observe()
+        return self.obs, StepResult(self.game, None)
+
+    def step(self, action):
+        """Play ENV_ACTIONS[action]; return (obs, reward, terminated, truncated, StepResult)"""
+        game = self.game
+        floor = game.current_floor
+        result = game.step(ENV_ACTIONS[action])
+        reward = game.current_floor - floor
+        if game.player.current_hp <= 0:
+            reward -= 1
+        self.observe()
+        return (self.obs, reward, result.done,
+                not result.done and game.turn >= self.max_turns, result)
+
+    def watch(self, dungeon):
+        """Point the array views at a new floor's grid"""
+        grid = dungeon.grid
+        self.dungeon = dungeon
+        self.flags = np.frombuffer(grid.flags, np.uint8)
+        self.doors = np.frombuffer(grid.doors, np.uint8)
+        self.types = np.frombuffer(grid.types, np.uint8)
+        self.monster_ids = np.frombuffer(grid.monster_ids, np.uint16)
+        self.loot_ids = np.frombuffer(grid.loot_ids, np.uint16)
+
+    def observe(self):
+        game = self.game
+        if game.dungeon is not self.dungeon:
+            self.watch(game.dungeon)
+        grid = self.dungeon.grid
+        channels = self.channels
+        revealed = channels[REVEALED_ROW]
+        np.bitwise_and(self.flags, CompactGrid.REVEALED, out=revealed)
+        np.right_shift(revealed, 1, out=revealed)
+        np.multiply(self.doors, revealed, out=channels[DOORS_ROW])
+        # Type codes start at 1 so that 0 can mean "not revealed"
+        np.add(self.types, 1, out=channels[TYPE_ROW])
+        np.multiply(channels[TYPE_ROW], revealed, out=channels[TYPE_ROW])
+
+        channels[MONSTER_ROW:PLAYER_ROW + 1].fill(0)
+        for cell in np.flatnonzero(self.monster_ids):
+            monster = grid.objects[self.monster_ids[cell]]
+            if revealed[cell] and monster.alive:
+                channels[MONSTER_ROW, cell] = 1 + MONSTER_TYPES.index(monster.type)
+                channels[MONSTER_HP_ROW, cell] = round(monster.hp * 2)
+        for cell in np.flatnonzero(self.loot_ids):
+            loot = grid.objects[self.loot_ids[cell]]
+            if revealed[cell]:
+                channels[LOOT_ROW, cell] = GEM_CODE[loot.color] if isinstance(loot, Gem) else GEAR_CODE[loot.type]
+        player = game.player
+        channels[PLAYER_ROW, grid.cell_index((player.x, player.y))] = 1
+
+        stats = self.stats
+        stats[0] = round(player.current_hp * 2)
+        stats[1] = round(player.max_hp * 2)
+        stats[2] = player.level
+        stats[3] = player.exp
+        stats[4] = player.exp_needed
+        stats[5] = player.attack
+        stats[6] = player.ranged_attack
+        stats[7] = player.armor
+        stats[8] = game.current_floor
+        stats[9] = game.turn
+
+# Per-env arrays of a vector env, largest item first so every view stays aligned
+VEC_ARRAYS = [('actions', 'int64', ()), ('rewards', 'float32', ()), ('obs', OBS_DTYPE, (OBS_SIZE,)),
+              ('terminated', 'bool', ()), ('truncated', 'bool', ())]
+
+def vec_buffer_size(count):
+    """Bytes needed for the arrays of a `count`-env vector env"""
+    return sum(count * int(np.prod(shape, dtype=int)) * np.dtype(dtype).itemsize
+               for _, dtype, shape in VEC_ARRAYS)
+
+def vec_arrays(buffer, count):
+    """Lay VEC_ARRAYS out over `buffer`, in VEC_ARRAYS order"""
+    arrays = []
+    offset = 0
+    for _, dtype, shape in VEC_ARRAYS:
+        view = np.ndarray((count,) + shape, dtype, buffer=buffer, offset=offset)
+        offset += view.nbytes
+        arrays.append(view)
+    return arrays
+
+class VecEnv:
+    """`count` DungeonEnvs stepped together, sharing one set of preallocated arrays.
+
+    step(actions) returns the same (obs, rewards, terminated, truncated)
+    arrays every time, updated in place. An env that finishes is reset at
+    once, so its obs row already shows the next game, as in Gym's vector
+    envs. Env i plays seeds seed + i, seed + i + count, ...
+    """
+    def __init__(self, count, seed=0, max_turns=1000, arrays=None, seed_stride=None):
+        if np is None:
+            raise RuntimeError("VecEnv needs NumPy")
+        if arrays is None:
+            arrays = vec_arrays(bytearray(vec_buffer_size(count)), count)
+        self.actions, self.rewards, self.obs, self.terminated, self.truncated = arrays
+        seed_stride = seed_stride or count
+        self.envs = [DungeonEnv(seed + i, max_turns, self.obs[i], seed_stride) for i in range(count)]
+
+    def reset(self):
+        for env in self.envs:
+            env.reset()
+        return self.obs
+
+    def step(self, actions=None):
+        """Step every env with `actions` (or whatever is already in self.actions)"""
+        if actions is not None:
+            self.actions[:] = actions
+        for i, env in enumerate(self.envs):
+            _, reward, terminated, truncated, _ = env.step(self.actions[i])
+            self.rewards[i] = reward
+            self.terminated[i] = terminated
+            self.truncated[i] = truncated
+            if terminated or truncated:
+                env.reset()
+        return self.obs, self.rewards, self.terminated, self.truncated
+
+def vec_worker(conn, shm_name, count, first, size, seed, max_turns):
+    """SubprocVecEnv worker: run envs first..first+size over the shared arrays until told to close"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    arrays = [array[first:first + size] for array in vec_arrays(shm.buf, count)]
+    envs = VecEnv(size, seed + first, max_turns, arrays, seed_stride=count)
+    del arrays
+    try:
+        while True:
+            command = conn.recv()
+            if command == 'step':
+                envs.step()
+            elif command == 'reset':
+                envs.reset()
+            else:
+                break
+            conn.send(True)
+    finally:
+        # The views must go before the mapping can be closed
+        del envs
+        shm.close()
+
+class SubprocVecEnv:
+    """A VecEnv split across worker processes.
+
+    The actions, observations, rewards and done flags live in one
+    multiprocessing.shared_memory block that every worker writes its own rows
+    of, so stepping only sends a one-word command down each pipe; nothing
+    else is pickled. Plays the same games as VecEnv(count, seed, max_turns).
+    Call close() (or use it as a context manager) to stop the workers.
+    """
+    def __init__(self, count, workers=None, seed=0, max_turns=1000):
+        if np is None:
+            raise RuntimeError("SubprocVecEnv needs NumPy")
+        workers = max(1, min(count, workers or os.cpu_count() or 1))
+        self.shm = shared_memory.SharedMemory(create=True, size=vec_buffer_size(count))
+        self.actions, self.rewards, self.obs, self.terminated, self.truncated = vec_arrays(self.shm.buf, count)
+        self.pipes = []
+        self.processes = []
+        for w in range(workers):
+            first = count * w // workers
+            size = count * (w + 1) // workers - first
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=vec_worker, args=(child, self.shm.name, count, first, size, seed, max_turns),
+                daemon=True)
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def command(self, command):
+        for pipe in self.pipes:
+            pipe.send(command)
+        for pipe in self.pipes:
+            pipe.recv()
+
+    def reset(self):
+        self.command('reset')
+        return self.obs
+
+    def step(self, actions=None):
+        if actions is not None:
+            self.actions[:] = actions
+        self.command('step')
+        return self.obs, self.rewards, self.terminated, self.truncated
+
+    def close(self):
+        if self.shm is None:
+            return
+        for pipe in self.pipes:
+            pipe.send('close')
+        for process in self.processes:
+            process.join()
+        self.actions = self.rewards = self.obs = self.terminated = self.truncated = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+# --- Benchmarks ---
+def measure_floor_memory(floors=200, turns=150, compact=False, seed=0):
+    """Return (bytes retained per explored floor, tiles per floor), measured with tracemalloc"""
+    import gc
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    kept = []
+    for i in range(floors):
+        game = Game(headless=True, compact=compact, seed=seed + i)
+        # Nothing may end the walk early: the point is a well-explored floor
+        game.player.current_hp = game.player.max_hp = 10 ** 9
+        rng = random.Random(seed + i)
+        for _ in range(turns):
+            action = wander_policy(game, rng)
+            game.step(Action.RANGED if action == Action.STAIRS else action)
+        kept.append(game.dungeon)
+    del game
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return used / floors, sum(len(dungeon.grid) for dungeon in kept) / floors
+
+def print_fight_odds(floor, attack=None, armor=None, hp=None):
+    player = Player()
+    attack = player.attack if attack is None else attack
+    armor = player.armor if armor is None else armor
+    hp = player.max_hp if hp is None else hp
+    print(f"Player ATK {attack}, ARM {armor}, HP {hp} on floor {floor}")
+    print(f"{'monster':<16} {'win%':>7} {'ambush%':>8} {'rounds':>7} {'HP left':>8}")
+    for monster_type in MonsterType:
+        stats = MonsterStats.lookup(monster_type, floor)
+        odds = solve_fight(attack, armor, hp, stats.attack, stats.armor, stats.hp)
+        ambush = solve_fight(attack, armor, hp, stats.attack, stats.armor, stats.hp, True)
+        hp_left = sum(left * p for left, p in odds.hp_remaining.items()) / odds.win if odds.win else 0
+        print(f"{monster_type.value:<16} {odds.win:>7.1%} {ambush.win:>8.1%} "
+              f"{odds.expected_rounds:>7.2f} {hp_left:>8.2f}")
+
+def check_zobrist(games=100, turns=150, seed=0):
+    """(seed, turn) of every random-play step after which a floor's running hash was wrong"""
+    wrong = []
+    for game_seed in range(seed, seed + games):
+        game = Game(headless=True, seed=game_seed)
+        rng = game.streams.stream('policy')
+        while not game.game_over and game.turn < turns:
+            game.step(random_policy(game, rng))
+            if game.dungeon.zobrist != game.dungeon.compute_zobrist():
+                wrong.append((game_seed, game.turn))
+    return wrong
+
+def measure_search_speed(games=20, turns=150, seed=0):
+    """Return (SearchBot decisions per second, transposition table hit rate)"""
+    import time
+    decisions = hits = lookups = 0
+    start = time.perf_counter()
+    for game_seed in range(seed, seed + games):
+        game = Game(headless=True, seed=game_seed)
+        bot = SearchBot()
+        rng = game.streams.stream('policy')
+        while not game.game_over and game.turn < turns:
+            game.step(bot(game, rng))
+            decisions += 1
+        hits += bot.table.hits
+        lookups += bot.table.hits + bot.table.misses
+    return decisions / (time.perf_counter() - start), hits / max(1, lookups)
+
+def run_benchmark(target, args):
+    if target == 'memory':
+        for compact in (False, True):
+            per_floor, tiles = measure_floor_memory(args.floors, args.turns, compact)
+            label = "compact" if compact else "dict"
+            print(f"{label:>8} floors: {per_floor:,.0f} bytes/floor ({tiles:.1f} tiles)")
+    elif target == 'search':
+        wrong = check_zobrist(turns=args.turns)
+        if wrong:
+            sys.exit(f"Running Zobrist hash went wrong at (seed, turn): {wrong[:10]}")
+        print("Running Zobrist hashes match recomputed ones")
+        speed, hit_rate = measure_search_speed(args.games or 20, args.turns)
+        print(f"SearchBot: {speed:,.1f} decisions/s, transposition table hit rate {hit_rate:.0%}")
+
+def floor_radius(text):
+    """argparse type for --radius: a floor needs at least the start and its 4 neighbours"""
+    radius = int(text)
+    if radius < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {radius}")
+    return radius
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="One Dice Dungeon Delve")
+    commands = parser.add_subparsers(dest='command')
+    play = commands.add_parser('play', help="play interactively (default)")
+    play.add_argument('--fullscreen', action='store_true',
+                      help="use the full-screen renderer that only redraws changed cells")
+    play.add_argument('--radius', type=floor_radius, default=FLOOR_RADIUS,
+                      help="how far floors reach from the start (large values make endless floors)")
+    play.add_argument('--hashed', action='store_true',
+                      help="lay out each tile from its coordinates, so a seed always makes the same floors")
+    play.add_argument('--minimap', action='store_true',
+                      help="show a coarse minimap of the explored floor (large floors only)")
+    sim = commands.add_parser('simulate', help="run headless balance simulations")
+    sim.add_argument('--games', type=int, default=1000)
+    sim.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    sim.add_argument('--policy', choices=sorted(POLICIES), default='wander')
+    sim.add_argument('--seed', type=int, default=0, help="seed of the first game")
+    sim.add_argument('--max-turns', type=int, default=1000)
+    sim.add_argument('--radius', type=floor_radius, default=FLOOR_RADIUS, help="floor radius")
+    sim.add_argument('--hashed', action='store_true', help="play on coordinate-hashed floors")
+    sim.add_argument('--chunk-size', type=int, default=1000, help="games per work unit")
+    sim.add_argument('--checkpoint', help="JSON file to resume from and save progress to")
+    sim.add_argument('--json', help="also write the merged stats to this file")
+    odds = commands.add_parser('odds', help="print exact fight odds against every monster type")
+    odds.add_argument('--floor', type=int, default=1)
+    odds.add_argument('--attack', type=int, help="player attack (default: a new player's)")
+    odds.add_argument('--armor', type=int, help="player armor (default: a new player's)")
+    odds.add_argument('--hp', type=float, help="player HP (default: a new player's)")
+    bench = commands.add_parser('bench', help="run a performance benchmark")
+    bench.add_argument('target', choices=['memory', 'search'])
+    bench.add_argument('--floors', type=int, default=200)
+    bench.add_argument('--turns', type=int, default=150, help="turns spent exploring each floor, or per game")
+    bench.add_argument('--games', type=int, help="games to play (default 20)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'simulate':
+        try:
+            stats = simulate(args.games, args.workers, args.policy, args.seed, args.max_turns,
+                             args.chunk_size, args.checkpoint, args.radius, args.hashed)
+        except CheckpointMismatch as mismatch:
+            sim.error(str(mismatch))
+        print(stats.report())
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(stats.to_dict(), f, indent=2)
+    elif args.command == 'odds':
+        print_fight_odds(args.floor, args.attack, args.armor, args.hp)
+    elif args.command == 'bench':
+        run_benchmark(args.target, args)
+    else:
+        game = Game(radius=getattr(args, 'radius', FLOOR_RADIUS), hashed=getattr(args, 'hashed', False))
+        game.minimap = getattr(args, 'minimap', False)
+        if getattr(args, 'fullscreen', False):
+            game.fullscreen_loop()
+        else:
+            game.game_loop()
 
 # Run the game
 if __name__ == '__main__':
-    game = Game()
-    game.game_loop()
+    main()
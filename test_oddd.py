@@ -0,0 +1,152 @@
+"""Checks of oddd's incrementally kept structures against recomputing them from the grid"""
+import random
+from collections import deque
+
+import pytest
+
+from oddd import (DIRECTIONS, DoorGraph, Dungeon, Game, RandomStreams, SIMULATION_ACTIONS,
+                  SparseDoorGraph, check_zobrist, random_policy, solve_fight)
+
+
+def played(seed, radius=4, hashed=False, turns=120):
+    """Yield a seeded game after each random-play step"""
+    game = Game(headless=True, seed=seed, radius=radius, hashed=hashed)
+    rng = game.streams.stream('policy')
+    while not game.game_over and game.turn < turns:
+        game.step(random_policy(game, rng))
+        yield game
+
+
+def door_bfs(grid, start):
+    """{coord: steps} walking through doors from start to tiles already on the floor"""
+    steps = {start: 0}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        tile = grid[(x, y)]
+        for direction in DIRECTIONS:
+            dx, dy = direction.value
+            neighbor = (x + dx, y + dy)
+            if tile.has_door(direction) and neighbor in grid and neighbor not in steps:
+                steps[neighbor] = steps[(x, y)] + 1
+                queue.append(neighbor)
+    return steps
+
+
+@pytest.mark.parametrize('radius, graph_type', [(4, DoorGraph), (20, SparseDoorGraph)])
+def test_door_graph_matches_bfs(radius, graph_type):
+    for seed in range(30):
+        for game in played(seed, radius):
+            dungeon = game.dungeon
+            assert type(dungeon.paths) is graph_type
+            start = (game.player.x, game.player.y)
+            expected = door_bfs(dungeon.grid, start)
+            assert dungeon.paths.row(start) == expected
+            for goal, steps in expected.items():
+                assert dungeon.paths.distance(start, goal) == steps
+                path = dungeon.paths.path(start, goal)
+                assert len(path) == steps + 1 and path[0] == start and path[-1] == goal
+                for (x, y), (next_x, next_y) in zip(path, path[1:]):
+                    assert abs(next_x - x) + abs(next_y - y) == 1
+
+
+def test_door_graph_columns_match_bfs():
+    for seed in range(15):
+        for game in played(seed):
+            grid = game.dungeon.grid
+            goal = (game.player.x, game.player.y)
+            expected = {coord: door_bfs(grid, coord)[goal] for coord in list(grid)
+                        if goal in door_bfs(grid, coord)}
+            assert game.dungeon.paths.column(goal) == expected
+
+
+@pytest.mark.parametrize('radius, hashed', [(4, False), (4, True), (20, False), (20, True)])
+def test_frontier_matches_grid_scan(radius, hashed):
+    for seed in range(30):
+        for game in played(seed, radius, hashed):
+            dungeon = game.dungeon
+            expected = set()
+            for (x, y), tile in dungeon.grid.items():
+                for direction in DIRECTIONS:
+                    dx, dy = direction.value
+                    if (tile.has_door(direction) and (x + dx, y + dy) not in dungeon.grid
+                            and abs(x + dx) + abs(y + dy) <= dungeon.radius):
+                        expected.add(((x, y), direction))
+            frontier = dungeon.frontier_doors()
+            assert len(frontier) == len(expected) and set(frontier) == expected
+
+
+@pytest.mark.parametrize('radius', [4, 20])
+def test_monster_registry_matches_grid_scan(radius):
+    for seed in range(30):
+        for game in played(seed, radius):
+            dungeon = game.dungeon
+            expected = {coord: tile.monster for coord, tile in dungeon.grid.items()
+                        if tile.monster is not None and tile.monster.alive}
+            assert dungeon.monsters == expected
+            assert dungeon.monster_positions == {monster: coord for coord, monster in expected.items()}
+
+
+@pytest.mark.parametrize('radius, seeds', [(4, 300), (12, 20)])
+def test_hashed_lair_can_be_reached(radius, seeds):
+    for seed in range(seeds):
+        dungeon = Dungeon(streams=RandomStreams(seed), radius=radius, hashed=True)
+        reached = {(0, 0)}
+        queue = deque(reached)
+        while queue:
+            x, y = queue.popleft()
+            tile = dungeon.build_tile(x, y)
+            for direction in DIRECTIONS:
+                dx, dy = direction.value
+                neighbor = (x + dx, y + dy)
+                if (tile.has_door(direction) and neighbor not in reached
+                        and dungeon.build_tile(*neighbor) is not None):
+                    reached.add(neighbor)
+                    queue.append(neighbor)
+        assert dungeon.lair_cell in reached
+
+
+def test_long_fights_solve_without_recursion():
+    odds = solve_fight(1, 5, 100, 1, 5, 100)
+    assert abs(odds.win + odds.loss - 1) < 1e-9
+    assert abs(sum(odds.rounds.values()) - 1) < 1e-9
+    assert abs(sum(odds.hp_remaining.values()) - odds.win) < 1e-9
+
+
+def test_fight_odds_are_not_shared_between_callers():
+    odds = solve_fight(10, 2, 20, 5, 1, 15)
+    odds.rounds.clear()
+    odds.hp_remaining.clear()
+    again = solve_fight(10, 2, 20, 5, 1, 15)
+    assert again.rounds and abs(sum(again.hp_remaining.values()) - again.win) < 1e-9
+
+
+def test_running_zobrist_matches_recompute():
+    assert check_zobrist(games=30) == []
+
+
+def snapshot(game):
+    player = game.player
+    return (game.turn, game.current_floor, game.game_over, player.x, player.y,
+            player.current_hp, player.level, player.exp, game.state_hash())
+
+
+@pytest.mark.parametrize('radius, hashed', [(4, False), (20, True)])
+def test_fork_replays_like_the_original(radius, hashed):
+    for seed in range(20):
+        game = Game(headless=True, seed=seed, radius=radius, hashed=hashed)
+        actions = random.Random(seed).choices(SIMULATION_ACTIONS, k=80)
+        for action in actions[:10]:
+            game.step(action)
+        fork = game.fork()
+        assert fork.state_hash() == game.state_hash()
+        # Play the fork all the way first, so any state it shares with the original would show
+        forked = []
+        for action in actions[10:]:
+            fork.step(action)
+            forked.append(snapshot(fork))
+        original = []
+        for action in actions[10:]:
+            game.step(action)
+            original.append(snapshot(game))
+        assert forked == original